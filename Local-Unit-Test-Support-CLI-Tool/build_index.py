@@ -1,10 +1,20 @@
 import os
 import logging
-from pathlib import Path
 import argparse
+from typing import Dict, List
 
-from rag_retrieval import get_code_files, get_embedding, save_to_faiss
-from ast_parser import extract_code_blocks
+from rag_retrieval import (
+    get_embeddings, save_to_faiss, update_faiss, is_code_file, is_test_file,
+    load_metadata, load_manifest, save_manifest, supports_incremental_update, configure_embedding_provider,
+    get_embedding_provider, INDEX_TYPES
+)
+from embedding_executor import DEFAULT_CONCURRENCY
+from embedding_providers import PROVIDERS, EMBEDDING_MODEL
+from metadata_store import MetadataStore
+from ast_parser import PARSER_VERSION, FileSymbols, expand_calls
+from diff_extractor import get_changed_files, get_head_commit, get_repo_identity, is_same_repository
+from repo_source import WorkingTreeSource, GitTreeSource
+from call_graph import RepoCallGraph, build_repo_call_graph
 
 # Set up logging
 logging.basicConfig(
@@ -13,20 +23,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def build_index(repo_path: str, index_path: str = "index.faiss", meta_path: str = "metadata.json"):
-    """Build FAISS index and metadata for a repository."""
+def hash_code_files(repo_path: str, code_files: List[str] = None, source=None) -> Dict[str, str]:
+    """Return the git blob SHA of every code file, keyed by repository-relative path."""
+    source = source or WorkingTreeSource(repo_path)
+    if code_files is None:
+        code_files = source.list_files()
+    return source.file_hashes(code_files)
+
+def create_manifest(repo_path: str, index_params: Dict, source=None) -> Dict:
+    """Describe what an index was built from: repository, commit, parser, embedding model and index parameters."""
+    source = source or WorkingTreeSource(repo_path)
+    return {
+        "repo": get_repo_identity(str(repo_path)),
+        "commit": source.commit,
+        "parser": PARSER_VERSION,
+        "embedding": get_embedding_provider().describe(),
+        "index": index_params,
+    }
+
+def index_impacts(store: MetadataStore, graph: RepoCallGraph, changed_files: List[str] = None) -> None:
+    """Record, for every source symbol, the test functions that reach it through a chain of calls
+    and the source functions calling it.
+
+    With changed_files, only the tests and source functions defined in those
+    files or reaching one of their symbols, before or after the change, are recomputed.
+    """
+    tests = {node for node in graph.callees if is_test_file(node[0])}
+    sources = set(graph.callees) - tests
+    if changed_files is not None:
+        changed_files = set(changed_files)
+        changed_symbols = [(path, name) for path in changed_files for name in graph.symbol_types.get(path, {})]
+        stale = store.get_tests_touching(changed_files)
+        tests = stale | (tests & ({node for node in tests if node[0] in changed_files} | graph.find_callers(changed_symbols)))
+        # Call edges only change for functions in the changed files or calling into them
+        direct_callers = {caller for symbol in changed_symbols for caller in graph.callers.get(symbol, ())}
+        stale = store.get_callers_touching(changed_files)
+        sources = stale | (sources & ({node for node in sources if node[0] in changed_files} | direct_callers))
+    reached = expand_calls(graph.callees, tests)
+    store.replace_impacts({
+        test: {symbol for symbol in symbols if not is_test_file(symbol[0])} for test, symbols in reached.items()
+    })
+    store.replace_calls({caller: graph.callees.get(caller, set()) for caller in sources})
+    logger.info(f"Indexed the symbols reached by {len(tests)} test functions")
+
+def build_index(repo_path: str, index_path: str = "index.faiss", meta_path: str = "metadata.db",
+                index_type: str = "auto", index_params: Dict = None, workers: int = None,
+                source=None, parsed_files: Dict[str, FileSymbols] = None) -> MetadataStore:
+    """Build FAISS index and metadata for a repository, parsing files with up to workers processes.
+
+    Files are read from source, a WorkingTreeSource or GitTreeSource (default: the
+    working tree of repo_path). parsed_files maps blob SHAs to the symbols parsed
+    for an earlier call (see repo_source.load_symbols).
+    """
     logger.info(f"Building index for repository: {repo_path}")
+    source = source or WorkingTreeSource(repo_path)
     
     # Get all code files
-    code_files = get_code_files(repo_path)
+    code_files = source.list_files()
     logger.info(f"Found {len(code_files)} code files")
     
     # Extract code blocks
-    code_blocks = {}
-    for file in code_files:
-        code_block = extract_code_blocks(file, repo_path)
-        if code_block:
-            code_blocks.update(code_block)
+    code_blocks = source.extract_code_blocks(code_files, workers)
     
     logger.info(f"Extracted {len(code_blocks)} code blocks")
     
@@ -36,15 +93,12 @@ def build_index(repo_path: str, index_path: str = "index.faiss", meta_path: str
 
     # Create embeddings
     logger.info("Creating embeddings")
-    embeddings = []
-    for block in code_blocks.values():
-        try:
-            embedding = get_embedding(block["code"])
-            embeddings.append(embedding)
-        except Exception as e:
-            logger.error(f"Failed to get embedding for block {block['symbol_name']}: {str(e)}")
-            continue
-            
+    try:
+        embeddings = get_embeddings([block["code"] for block in code_blocks.values()])
+    except Exception as e:
+        logger.error(f"Failed to get embeddings for {len(code_blocks)} code blocks: {str(e)}")
+        raise
+
     if not embeddings:
         logger.error("No embeddings were created")
         raise ValueError("Failed to create any embeddings")
@@ -52,16 +106,166 @@ def build_index(repo_path: str, index_path: str = "index.faiss", meta_path: str
     logger.info(f"Created {len(embeddings)} embeddings")
     
     # Save to FAISS and metadata
-    save_to_faiss(embeddings, code_blocks, index_path, meta_path)
-    logger.info(f"Index saved to {index_path}")
+    index_params = save_to_faiss(embeddings, code_blocks, index_path, meta_path, index_type, index_params)
+    store = load_metadata(meta_path)
+    store.update_file_hashes(hash_code_files(repo_path, code_files, source))
+    index_impacts(store, build_repo_call_graph(source, parsed_files, workers=workers))
+    save_manifest(index_path, create_manifest(repo_path, index_params, source))
+    logger.info(f"Index ({index_params['type']}) saved to {index_path}")
     logger.info(f"Metadata saved to {meta_path}")
+    return store
+
+def update_index(repo_path: str, changed_files: List[str], store: MetadataStore,
+                 index_path: str = "index.faiss", meta_path: str = "metadata.db", workers: int = None,
+                 source=None, parsed_files: Dict[str, FileSymbols] = None) -> MetadataStore:
+    """Re-index only the symbols of the changed files in an existing index."""
+    source = source or WorkingTreeSource(repo_path)
+    changed_files = sorted({file for file in changed_files if file})
+    logger.info(f"Updating index for {len(changed_files)} changed files")
+
+    old_blocks = {}
+    for file in changed_files:
+        old_blocks.update(store.get_by_file(file))
+    new_blocks = source.extract_code_blocks(
+        [file for file in changed_files if is_code_file(file) and source.exists(file)], workers
+    )
+
+    # Symbols that were deleted or whose code changed lose their vectors,
+    # and only new or changed symbols are embedded again
+    removed = [key for key, block in old_blocks.items()
+               if key not in new_blocks or new_blocks[key]["code"] != block["code"]]
+    added = {key: block for key, block in new_blocks.items()
+             if key not in old_blocks or old_blocks[key]["code"] != block["code"]}
+    logger.info(f"Removing {len(removed)} and adding {len(added)} code blocks")
+
+    embeddings = []
+    if added:
+        try:
+            embeddings = get_embeddings([block["code"] for block in added.values()])
+        except Exception as e:
+            logger.error(f"Failed to get embeddings for {len(added)} code blocks: {str(e)}")
+            raise
+
+    update_faiss(removed, embeddings, added, index_path, meta_path)
+
+    # Deleted functions stay call targets, so tests still calling them are found
+    deleted = [key for key, block in old_blocks.items() if key not in new_blocks and block["symbol_type"] == "function"]
+    index_impacts(store, build_repo_call_graph(source, parsed_files, deleted, workers), changed_files)
+    return store
+
+def find_drifted_files(indexed_hashes: Dict[str, str], current_hashes: Dict[str, str]) -> List[str]:
+    """Return the files that were added, removed or modified since they were indexed."""
+    return sorted(
+        file for file in set(indexed_hashes) | set(current_hashes)
+        if indexed_hashes.get(file) != current_hashes.get(file)
+    )
+
+def refresh_index(repo_path: str, index_path: str = "index.faiss", meta_path: str = "metadata.db",
+                  git_diff_extractor=None, index_type: str = "auto", index_params: Dict = None,
+                  workers: int = None, source=None, parsed_files: Dict[str, FileSymbols] = None) -> MetadataStore:
+    """Bring the index up to date with the repository, incrementally when possible.
+
+    The index is bound to the repository, parser version and embedding model it
+    was built from; an index of another repository, parser or model is rebuilt. Otherwise only the files whose blob hash drifted from
+    the hashes recorded in the metadata store are re-indexed. Indexes without per-file hashes fall back to the
+    git diff since the last indexed commit (through git_diff_extractor when one is
+    given), and to a full build when that commit is unknown. index_type and
+    index_params only apply when the index has to be (re)built. Files are
+    parsed with up to workers processes and read from source (default: the
+    working tree of repo_path), reusing parsed_files (see build_index).
+    """
+    source = source or WorkingTreeSource(repo_path)
+    if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+        return build_index(repo_path, index_path, meta_path, index_type, index_params, workers, source, parsed_files)
+
+    manifest = load_manifest(index_path)
+    repo_identity = get_repo_identity(str(repo_path))
+    indexed_repo = manifest.get("repo")
+    if indexed_repo and repo_identity and not is_same_repository(indexed_repo, repo_identity):
+        logger.info(f"Existing index belongs to another repository ({indexed_repo.get('remote')}), rebuilding index")
+        return build_index(repo_path, index_path, meta_path, index_type, index_params, workers, source, parsed_files)
+    # Indexes from before parser versions were recorded use unqualified method names
+    if manifest.get("parser", 1) != PARSER_VERSION:
+        logger.info("Existing index was built by another parser version, rebuilding index")
+        return build_index(repo_path, index_path, meta_path, index_type, index_params, workers, source, parsed_files)
+    # Indexes from before providers were recorded hold Gemini embeddings
+    indexed_model = manifest.get("embedding", {}).get("model", EMBEDDING_MODEL)
+    if indexed_model != get_embedding_provider().model:
+        logger.info(f"Existing index was embedded with {indexed_model}, rebuilding index")
+        return build_index(repo_path, index_path, meta_path, index_type, index_params, workers, source, parsed_files)
+    if index_type == "auto" and manifest.get("index"):
+        # Keep the index type and parameters the index was built with
+        index_params = {**manifest["index"], **(index_params or {})}
+        index_type = index_params.pop("type")
+
+    store = load_metadata(meta_path)
+    indexed_hashes = store.get_file_hashes()
+    current_hashes = hash_code_files(repo_path, source=source)
+    if indexed_hashes:
+        changed_files = find_drifted_files(indexed_hashes, current_hashes)
+    else:
+        last_commit = manifest.get("commit")
+        head_commit = source.commit
+        if not last_commit or not head_commit or not get_head_commit(str(repo_path), last_commit):
+            logger.info("Last indexed commit is unknown, rebuilding index")
+            store.close()
+            return build_index(repo_path, index_path, meta_path, index_type, index_params, workers, source, parsed_files)
+        if git_diff_extractor is not None:
+            changed_files = git_diff_extractor.get_changed_files(last_commit, head_commit)
+        else:
+            changed_files = get_changed_files(str(repo_path), last_commit, head_commit)
+
+    if changed_files and not supports_incremental_update(index_path):
+        # Unchanged blocks come from the embedding cache, so this only costs the index build
+        logger.info("Existing index does not support removing vectors, rebuilding index")
+        store.close()
+        return build_index(repo_path, index_path, meta_path, index_type, index_params, workers, source, parsed_files)
+
+    if changed_files:
+        update_index(repo_path, changed_files, store, index_path, meta_path, workers, source, parsed_files)
+    else:
+        logger.info("Index is up to date")
+    if indexed_hashes:
+        store.update_file_hashes(
+            {file: current_hashes[file] for file in changed_files if file in current_hashes},
+            removed=[file for file in changed_files if file not in current_hashes],
+        )
+    else:
+        store.update_file_hashes(current_hashes)
+    save_manifest(index_path, create_manifest(repo_path, manifest.get("index", {"type": "flat"}), source))
+    return store
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Build FAISS index and metadata for a repository")
     parser.add_argument("repo_path", help="Path to the repository")
     parser.add_argument("--index", default="index.faiss", help="Path to save FAISS index (default: index.faiss)")
-    parser.add_argument("--meta", default="metadata.json", help="Path to save metadata (default: metadata.json)")
+    parser.add_argument("--meta", default="metadata.db", help="Path to save the metadata store (default: metadata.db)")
+    parser.add_argument("--incremental", action="store_true", help="Only re-index files changed since the last indexed commit (default: full rebuild)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="auto", help="FAISS index type; auto picks one from the corpus size (default: auto)")
+    parser.add_argument("--nlist", type=int, help="Number of IVF lists (default: about 4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, help="Number of IVF lists searched per query (default: min(nlist, 16))")
+    parser.add_argument("--pq-m", dest="pq_m", type=int, help="Number of PQ sub-quantizers for ivf_pq (default: dim/8)")
+    parser.add_argument("--hnsw-m", dest="hnsw_m", type=int, help="Number of HNSW neighbors per node (default: 32)")
+    parser.add_argument("--ef-search", dest="ef_search", type=int, help="HNSW search depth (default: 64)")
+    parser.add_argument("--workers", type=int, help="Number of processes parsing files; 1 parses serially (default: CPU count)")
+    parser.add_argument("--embedding-provider", dest="embedding_provider", choices=list(PROVIDERS), default="gemini", help="Embedding backend; local needs no network (default: gemini)")
+    parser.add_argument("--embed-concurrency", dest="embed_concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Number of concurrent embedding requests (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rpm", type=int, help="Embedding requests per minute quota (default: unlimited)")
+    parser.add_argument("--tpm", type=int, help="Embedding tokens per minute quota (default: unlimited)")
+    parser.add_argument("--commit", help="Index this commit straight from the git object database, without a checkout (default: the working tree)")
     
     args = parser.parse_args()
     
-    build_index(args.repo_path, args.index, args.meta) 
\ No newline at end of file
+    index_params = {
+        name: getattr(args, name)
+        for name in ["nlist", "nprobe", "pq_m", "hnsw_m", "ef_search"]
+        if getattr(args, name) is not None
+    }
+    configure_embedding_provider(args.embedding_provider, args.embed_concurrency, args.rpm, args.tpm)
+    source = GitTreeSource(args.repo_path, args.commit) if args.commit else None
+    if args.incremental:
+        store = refresh_index(args.repo_path, args.index, args.meta, index_type=args.index_type, index_params=index_params,
+                              workers=args.workers, source=source)
+    else:
+        store = build_index(args.repo_path, args.index, args.meta, args.index_type, index_params, args.workers, source)
+    store.close()
@@ -0,0 +1,109 @@
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+# HTTP status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def estimate_tokens(texts: List[str]) -> int:
+    """Roughly estimate the number of tokens in a request (about 4 characters per token)."""
+    return sum(len(text) for text in texts) // 4 + 1
+
+def is_retryable(error: Exception) -> bool:
+    """Return True if an API error is a rate limit or a transient server error."""
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return status in RETRYABLE_STATUS_CODES
+
+class RateLimiter:
+    """Sliding-window limiter on requests and tokens per minute, shared by all workers.
+
+    A limit of None means unlimited.
+    """
+
+    def __init__(self, rpm: int = None, tpm: int = None, period: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.period = period
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.requests = deque()
+        self.used_tokens = 0
+
+    def _fits(self, tokens: int) -> bool:
+        if self.rpm is not None and len(self.requests) >= self.rpm:
+            return False
+        # A request larger than the whole token budget is let through on an empty window
+        if self.tpm is not None and self.requests and self.used_tokens + tokens > self.tpm:
+            return False
+        return True
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until a request of the given size fits in the current window."""
+        while True:
+            with self.lock:
+                now = self.clock()
+                while self.requests and self.requests[0][0] <= now - self.period:
+                    self.used_tokens -= self.requests.popleft()[1]
+                if self._fits(tokens):
+                    self.requests.append((now, tokens))
+                    self.used_tokens += tokens
+                    return
+                wait = self.requests[0][0] + self.period - now
+            self.sleep(max(wait, 0.01))
+
+class EmbeddingExecutor:
+    """Run embedding requests concurrently within the rate limits, retrying transient errors.
+
+    embed_batch takes a list of texts and returns one vector per text.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], List[List[float]]], max_concurrency: int = DEFAULT_CONCURRENCY,
+                 rpm: int = None, tpm: int = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 60.0, sleep: Callable[[float], None] = time.sleep):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.embed_batch = embed_batch
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(rpm, tpm, sleep=sleep)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Return the exponential backoff delay with full jitter for a retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, waiting for the rate limiter and retrying transient errors."""
+        tokens = estimate_tokens(texts)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return self.embed_batch(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"Embedding request failed ({str(e)}), retrying in {delay:.1f}s")
+                self.sleep(delay)
+
+    def map(self, batches: List[List[str]]) -> List[List[List[float]]]:
+        """Embed all batches, returning the results in batch order."""
+        if len(batches) <= 1 or self.max_concurrency == 1:
+            return [self.run_batch(batch) for batch in batches]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+            futures = [pool.submit(self.run_batch, batch) for batch in batches]
+            try:
+                return [future.result() for future in futures]
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
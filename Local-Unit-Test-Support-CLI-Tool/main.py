@@ -1,16 +1,18 @@
 import os
 import logging
-from pathlib import Path
 import argparse
-from typing import List, Dict, Set, Tuple
-import json
-import faiss
+from typing import List, Dict, Set, Tuple, Optional
 
-from diff_extractor import GitDiffExtractor
-from ast_parser import analyze_ast_diff, extract_code_blocks, extract_call_graph, expand_calls
-from rag_retrieval import get_code_files, get_embedding, save_to_faiss
+from diff_extractor import GitDiffExtractor, split_diff_hunks, list_commits, get_head_commit, CLONE_MODES
+from ast_parser import analyze_ast_diff, FileSymbols
+from rag_retrieval import load_metadata, get_embeddings, search_index, is_test_file, configure_embedding_provider
+from embedding_executor import DEFAULT_CONCURRENCY
+from embedding_providers import PROVIDERS
+from metadata_store import MetadataStore
+from build_index import refresh_index
+from repo_source import GitTreeSource, WorkingTreeSource
+from call_graph import RepoCallGraph, build_repo_call_graph
 # from rag_augmentation import augment_coverage_suggestion_prompt, augment_test_suggestion_prompt
-from rag_generation import GeminiSuggester
 from report_formatter import generate_suggestion_markdown
 
 # Set up logging
@@ -20,74 +22,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def load_existing_index(index_path: str = "index.faiss", meta_path: str = "metadata.json") -> Tuple[Dict, bool]:
-    """Load existing FAISS index and metadata if available."""
+_suggester = None
+
+def get_suggester():
+    """Return the shared suggester, so a resident server reuses its API client."""
+    global _suggester
+    if _suggester is None:
+        # Imported on first use: google.genai and pydantic are slow to import
+        from rag_generation import GeminiSuggester
+        _suggester = GeminiSuggester()
+    return _suggester
+
+def load_existing_index(index_path: str = "index.faiss", meta_path: str = "metadata.db") -> Tuple[Optional[MetadataStore], bool]:
+    """Open the metadata store of an existing FAISS index if available.
+
+    Returns the store, which the caller closes, and True, or None and False.
+    """
     if os.path.exists(index_path) and os.path.exists(meta_path):
         try:
-            # Load metadata
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-            
-            # Convert metadata list to dictionary format
-            code_blocks = {}
-            for item in metadata:
-                key = (item['file_path'], item['symbol_name'])
-                code_blocks[key] = {
-                    'symbol_type': item['symbol_type'],
-                    'symbol_name': item['symbol_name'],
-                    'file_path': item['file_path'],
-                    'code': item['code']
-                }
-            
+            code_blocks = load_metadata(meta_path)
             logger.info(f"Loaded existing index with {len(code_blocks)} code blocks")
             return code_blocks, True
         except Exception as e:
             logger.error(f"Error loading existing index: {str(e)}")
-            return {}, False
-    return {}, False
-
-def process_code_files(repo_path: str) -> Dict:
-    """Process all code files in the repository and create embeddings."""
-    # Try to load existing index first
-    code_blocks, index_exists = load_existing_index()
-    if index_exists:
-        return code_blocks
+            return None, False
+    return None, False
 
+def process_code_files(repo_path: str, git_diff_extractor: GitDiffExtractor = None, source=None,
+                       parsed_files: Dict[str, FileSymbols] = None) -> MetadataStore:
+    """Process all code files in the repository (read from source when given) and create embeddings."""
+    # Build the index, rebuild it if it belongs to another repository, parser or
+    # model (or predates manifests), or re-index only the files that drifted since it was built
     logger.info("Processing code files")
-    code_files = get_code_files(repo_path)
-    logger.debug(f"Found {len(code_files)} code files")
-    
-    code_blocks = {}
-    for file in code_files:
-        code_block = extract_code_blocks(file, repo_path)
-        if code_block:  # Only update if we got valid blocks
-            code_blocks.update(code_block)
-    
-    logger.debug(f"Extracted {len(code_blocks)} code blocks")
-    
-    if not code_blocks:
-        logger.error("No code blocks were extracted from the repository")
-        raise ValueError("No code blocks found in repository")
-
-    # Create embeddings
-    logger.info("Creating embeddings")
-    embeddings = []
-    for block in code_blocks.values():
-        try:
-            embedding = get_embedding(block["code"])
-            embeddings.append(embedding)
-        except Exception as e:
-            logger.error(f"Failed to get embedding for block {block['symbol_name']}: {str(e)}")
-            continue
-            
-    if not embeddings:
-        logger.error("No embeddings were created")
-        raise ValueError("Failed to create any embeddings")
-        
-    logger.debug(f"Created {len(embeddings)} embeddings")
-    save_to_faiss(embeddings, code_blocks)
-    
-    return code_blocks
+    return refresh_index(repo_path, git_diff_extractor=git_diff_extractor, source=source, parsed_files=parsed_files)
 
 def analyze_changed_files(git_diff_extractor: GitDiffExtractor) -> Tuple[Dict[str, Dict], List[str], str]:
     """Analyze changed files and collect git diff messages."""
@@ -108,11 +75,21 @@ def analyze_changed_files(git_diff_extractor: GitDiffExtractor) -> Tuple[Dict[st
         before_code = git_diff_extractor.load_file_from_previous_commit(file, git_diff_extractor.from_commit)
         after_code = git_diff_extractor.load_file_from_previous_commit(file, git_diff_extractor.to_commit)
         changes = analyze_ast_diff(before_code, after_code)
+        if not (changes["added"] or changes["removed"] or changes["modified"] or changes["module"]):
+            # Only formatting, comments or docstrings changed
+            logger.debug(f"No structural changes in {file}")
+            continue
         changed_functions[file] = changes
         git_diff_message = git_diff_extractor.get_diff(file)
         git_diff_message_list.append(git_diff_message)
 
     whole_git_diff = "\n".join(git_diff_message_list)
+    all_changed = list_changed_names(changed_functions)
+    logger.debug(f"Found {len(all_changed)} changed functions")
+    return changed_functions, all_changed, whole_git_diff
+
+def list_changed_names(changed_functions: Dict[str, Dict]) -> List[str]:
+    """Return the names of all added, removed, modified and indirectly dependent functions."""
     all_changed = []
     for file, changes in changed_functions.items():
         all_changed.extend(
@@ -121,52 +98,158 @@ def analyze_changed_files(git_diff_extractor: GitDiffExtractor) -> Tuple[Dict[st
             changes.get("modified", []) +
             changes.get("indirect_dependents", [])
         )
-    
-    logger.debug(f"Found {len(all_changed)} changed functions")
-    return changed_functions, all_changed, whole_git_diff
+    return all_changed
+
+def build_change_graph(repo_path: str, changed_functions: Dict[str, Dict], source=None,
+                       parsed_files: Dict[str, FileSymbols] = None) -> RepoCallGraph:
+    """Build the repository call graph at to_commit, keeping deleted functions as call targets."""
+    removed = get_removed_nodes(changed_functions)
+    return build_repo_call_graph(source or WorkingTreeSource(repo_path), parsed_files, removed)
+
+def find_indirect_dependents(changed_functions: Dict[str, Dict], graph: RepoCallGraph = None,
+                             store: MetadataStore = None) -> Dict[str, Dict]:
+    """Set the indirect dependents to the source functions that reach a change through a chain of calls.
+
+    Unlike the per-file dependents of analyze_ast_diff, these follow resolved
+    calls across modules; dependents in files without changes of their own are
+    added under those files. Calls are followed in graph when given, otherwise
+    in the call edges stored in the index.
+    """
+    changed = get_changed_nodes(changed_functions, [], {})
+    callers = graph.find_callers(changed) if graph is not None else store.get_callers(changed)
+    for changes in changed_functions.values():
+        changes["indirect_dependents"] = []
+    for file, name in sorted(callers - changed):
+        if is_test_file(file):
+            continue
+        changes = changed_functions.setdefault(file, {
+            "added": [], "removed": [], "modified": [], "indirect_dependents": [], "module": False
+        })
+        changes["indirect_dependents"].append(name)
+    return changed_functions
 
-def process_test_files(repo_path: str, all_changed: List[str], code_blocks: Dict) -> Tuple[List[Dict], str]:
-    """Process test files and find affected test functions."""
+def find_test_files(repo_path: str, source=None) -> List[str]:
+    """Return the repository-relative paths of the test files, listed from source (the working tree by default)."""
+    source = source or WorkingTreeSource(repo_path)
+    return [
+        file_path for file_path in source.list_files()
+        if is_test_file(file_path) and "Local-Unit-Test-Support" not in file_path
+    ]
+
+def get_changed_nodes(changed_functions: Optional[Dict[str, Dict]], all_changed: List[str], files: Dict[str, FileSymbols]) -> Set[Tuple[str, str]]:
+    """Return the changed functions as (relative_path, name) call graph nodes.
+
+    Indirect dependents are left out since the call graph finds them itself.
+    Without changed_functions, every definition of a name in all_changed counts.
+    """
+    if changed_functions is None:
+        names = set(all_changed)
+        return {(path, name) for path, symbols in files.items() for name in symbols.symbols if name in names}
+    return {
+        (file, name)
+        for file, changes in changed_functions.items()
+        for name in changes.get("added", []) + changes.get("removed", []) + changes.get("modified", [])
+    }
+
+def get_removed_nodes(changed_functions: Dict[str, Dict]) -> Set[Tuple[str, str]]:
+    """Return the functions deleted by the change as (relative_path, name) call graph nodes."""
+    return {(file, name) for file, changes in changed_functions.items() for name in changes.get("removed", [])}
+
+def process_test_files(repo_path: str, all_changed: List[str], code_blocks: Dict, source=None,
+                       parsed_files: Dict[str, FileSymbols] = None,
+                       changed_functions: Dict[str, Dict] = None, graph: RepoCallGraph = None) -> List[Dict]:
+    """Find the test functions affected by the changes, following calls across the repository.
+
+    A test function is affected when a chain of calls leads it to a changed
+    function. When code_blocks is the index's MetadataStore, the tests reaching
+    each changed function are looked up in its reverse dependency index.
+    Functions deleted by the change are not in that index, and indexes built
+    without one, or plain dicts of code blocks, fall back to the repository
+    call graph: graph when given, otherwise every Python file of source (the
+    working tree by default) goes into one call graph here.
+    parsed_files maps blob SHAs to parsed symbols and, when given, is reused
+    and updated, so unchanged files are not parsed again.
+    """
     logger.info("Processing test files")
-    test_files_processed = 0
-    affected_metadata_list = []
-    whole_test_code = ""
-    
-    for root, _, files in os.walk(repo_path):
-        for filename in files:
-            if ("test_" in filename or "_test" in filename) and filename.endswith(".py"):
-                test_path = os.path.join(root, filename)
-                logger.info(f"Processing test file: {test_path}")
-                relative_path = str(Path(test_path).relative_to(Path(repo_path)))
-                if "Local-Unit-Test-Support" in relative_path:
-                    continue
-                try:
-                    with open(test_path, "r") as tf:
-                        test_code = tf.read()
-                        call_map = extract_call_graph(test_code)
-                        test_func2call_func = expand_calls(call_map)
-                        filename_code = relative_path + "\n" + test_code
-                        affected_test_function = [
-                            k for k, v in test_func2call_func.items() 
-                            if any(func in all_changed for func in v)
-                        ]
-                        path_funcname_pair = [(relative_path, func_name) for func_name in affected_test_function]
-                        affected_metadata = [code_blocks[k] for k in path_funcname_pair if k in code_blocks]
-                        affected_metadata_list.extend(affected_metadata)
-                        whole_test_code += filename_code + "\n"
-                        test_files_processed += 1
-                except Exception as e:
-                    logger.error(f"Error processing test file {test_path}: {str(e)}")
-                    continue
-
-    logger.debug(f"Processed {test_files_processed} test files")
+    if changed_functions is not None and isinstance(code_blocks, MetadataStore) and code_blocks.has_impacts():
+        removed = get_removed_nodes(changed_functions)
+        affected = code_blocks.get_impacted_tests(get_changed_nodes(changed_functions, all_changed, {}) - removed)
+        if removed:
+            # The index was built from to_commit, where deleted functions no longer exist
+            graph = graph or build_change_graph(repo_path, changed_functions, source, parsed_files)
+            affected |= graph.find_callers(removed)
+    else:
+        # Deleted functions stay call targets so tests still calling them are found
+        graph = graph or build_change_graph(repo_path, changed_functions or {}, source, parsed_files)
+        affected = graph.find_callers(get_changed_nodes(changed_functions, all_changed, graph.files))
+    affected_metadata_list = [code_blocks[node] for node in sorted(affected) if is_test_file(node[0]) and node in code_blocks]
     logger.debug(f"Found {len(affected_metadata_list)} affected test functions")
-    return affected_metadata_list, whole_test_code
+    return affected_metadata_list
+
+def read_test_code(repo_path: str, source=None) -> str:
+    """Return the code of every test file, each preceded by its path."""
+    source = source or WorkingTreeSource(repo_path)
+    whole_test_code = ""
+    for relative_path in find_test_files(repo_path, source):
+        test_code = source.read_text(relative_path)
+        if test_code is None:
+            logger.error(f"Error processing test file {relative_path}: File not found")
+            continue
+        whole_test_code += relative_path + "\n" + test_code + "\n"
+    return whole_test_code
 
-def generate_report(affected_metadata_list: List[Dict], whole_test_code: str, whole_git_diff: str, output_filename: str) -> None:
-    """Generate and save the test maintenance report."""
+def retrieve_related_tests(changed_functions: Dict[str, Dict], code_blocks: MetadataStore, whole_git_diff: str,
+                           top_k: int = 20, index_path: str = "index.faiss") -> List[Dict]:
+    """Query the FAISS index with the changed functions and diff hunks to find related test functions."""
+    logger.info("Retrieving related test functions")
+    queries = []
+    for file, changes in changed_functions.items():
+        for name in changes.get("added", []) + changes.get("modified", []) + changes.get("indirect_dependents", []):
+            block = code_blocks.get((file, name))
+            if block:
+                queries.append(block["code"])
+    queries.extend(split_diff_hunks(whole_git_diff))
+    if not queries:
+        return []
+
+    # Hits on non-test code are dropped, so over-fetch, and search again with a larger k
+    # until top_k test functions are found or the index has no more vectors to return
+    query_embeddings = get_embeddings(queries)
+    k = top_k * 4
+    blocks = {}
+    while True:
+        best_distances = {}
+        results = search_index(query_embeddings, k=k, save_path=index_path)
+        for hits in results:
+            for vector_id, distance in hits:
+                if distance < best_distances.get(vector_id, float("inf")):
+                    best_distances[vector_id] = distance
+        blocks.update(code_blocks.get_by_ids([vector_id for vector_id in best_distances if vector_id not in blocks]))
+        test_blocks = {
+            vector_id: blocks[vector_id] for vector_id in best_distances
+            if vector_id in blocks and blocks[vector_id]["symbol_type"] == "function" and is_test_file(blocks[vector_id]["file_path"])
+        }
+        if len(test_blocks) >= top_k or all(len(hits) < k for hits in results):
+            break
+        k *= 4
+    ranked = sorted(test_blocks, key=best_distances.get)[:top_k]
+    logger.debug(f"Retrieved {len(ranked)} related test functions from {len(queries)} queries")
+    return [test_blocks[vector_id] for vector_id in ranked]
+
+def format_test_code(test_metadata_list: List[Dict]) -> str:
+    """Join test function code grouped by file, skipping duplicates."""
+    by_file = {}
+    for block in test_metadata_list:
+        by_file.setdefault(block["file_path"], {})[block["symbol_name"]] = block["code"]
+    return "\n".join(
+        file_path + "\n" + "\n\n".join(functions.values()) + "\n"
+        for file_path, functions in by_file.items()
+    )
+
+def generate_report(affected_metadata_list: List[Dict], whole_test_code: str, whole_git_diff: str, output_filename: str) -> str:
+    """Generate and save the test maintenance report, returning its path (None when there are no suggestions)."""
     logger.info("Generating suggestions")
-    gemini_suggester = GeminiSuggester()
+    gemini_suggester = get_suggester()
     suggestions = gemini_suggester.get_test_suggestions(
         affected_metadata_list, 
         whole_test_code, 
@@ -181,31 +264,112 @@ def generate_report(affected_metadata_list: List[Dict], whole_test_code: str, wh
             f.write("This report generates suggestions for updating your unit tests based on file changes. \n")
             f.write(report)
         logger.info(f"Report generated successfully at {report_path}")
-    else:
-        logger.info("No suggestions generated")
+        return report_path
+    logger.info("No suggestions generated")
+    return None
+
+def analyze_commit(repo_path: str, git_diff_extractor: GitDiffExtractor, output_filename: str, top_k: int = 20,
+                   source=None, parsed_files: Dict[str, FileSymbols] = None) -> str:
+    """Analyze the changes between the extractor's from_commit and to_commit and write their report.
+
+    Returns the report path, or None when there were no suggestions.
+    """
+    # Analyze changed files
+    changed_functions, all_changed, whole_git_diff = analyze_changed_files(git_diff_extractor)
+    if not changed_functions:
+        # Only git was needed: the index and the suggestion model are never loaded
+        logger.info("No Python source code changed, nothing to suggest")
+        return None
+
+    # Process code files and create embeddings
+    parsed_files = {} if parsed_files is None else parsed_files
+    code_blocks = process_code_files(repo_path, git_diff_extractor, source, parsed_files)
+    with code_blocks:
+        # Follow the changes to the functions calling them, across modules. The index stores
+        # the call edges of to_commit, so the call graph is only built when it has none or
+        # when functions were deleted
+        graph = None
+        if not code_blocks.has_impacts() or get_removed_nodes(changed_functions):
+            graph = build_change_graph(repo_path, changed_functions, source, parsed_files)
+        find_indirect_dependents(changed_functions, graph, code_blocks)
+        all_changed = list_changed_names(changed_functions)
 
-def main(repo_url: str, from_commit: str, to_commit: str, keep_repo: bool, output_filename: str):
-    """Main function to analyze repository changes and generate test suggestions."""
-    try:
-        output_filename += ".md"
-        
-        # Initialize git diff extractor
-        logger.info(f"Initializing GitDiffExtractor for {repo_url}")
-        git_diff_extractor = GitDiffExtractor(repo_url, from_commit, to_commit, keep_repo)
-        repo_path = git_diff_extractor.repo_path
-
-        # Process code files and create embeddings
-        code_blocks = process_code_files(repo_path)
-        
-        # Analyze changed files
-        _, all_changed, whole_git_diff = analyze_changed_files(git_diff_extractor)
-        
         # Process test files
-        affected_metadata_list, whole_test_code = process_test_files(repo_path, all_changed, code_blocks)
-        
-        # Generate report
-        generate_report(affected_metadata_list, whole_test_code, whole_git_diff, output_filename)
+        affected_metadata_list = process_test_files(
+            repo_path, all_changed, code_blocks, source, parsed_files, changed_functions, graph
+        )
+
+        # Retrieve related tests so only relevant test code goes into the prompt
+        try:
+            related_tests = retrieve_related_tests(changed_functions, code_blocks, whole_git_diff, top_k)
+            test_code = format_test_code(affected_metadata_list + related_tests)
+        except Exception as e:
+            logger.warning(f"Falling back to all test code, retrieval failed: {str(e)}")
+            test_code = read_test_code(repo_path, source)
+    
+    # Generate report
+    return generate_report(affected_metadata_list, test_code, whole_git_diff, output_filename)
+
+def analyze_commit_range(repo_path: str, git_diff_extractor: GitDiffExtractor, output_filename: str, top_k: int = 20,
+                         parsed_files: Dict[str, FileSymbols] = None) -> List[str]:
+    """Analyze every commit of from_commit..to_commit against its parent, oldest first.
+
+    Each commit is read from the object database and gets its own report,
+    <output>-<n>-<short sha>.md. The index is refreshed incrementally from one
+    commit to the next and files are only parsed again when they change,
+    so every step only pays for its own changes. Returns the report paths.
+    """
+    from_commit, to_commit = git_diff_extractor.from_commit, git_diff_extractor.to_commit
+    commits = list_commits(str(git_diff_extractor.repo_path), from_commit, to_commit)
+    logger.info(f"Analyzing {len(commits)} commits in {from_commit}..{to_commit}")
+    base_filename, extension = os.path.splitext(output_filename)
+    parsed_files = {} if parsed_files is None else parsed_files
+    report_paths = []
+    for number, commit in enumerate(commits, 1):
+        parent = get_head_commit(str(git_diff_extractor.repo_path), f"{commit}^")
+        if parent is None:
+            logger.warning(f"Skipping root commit {commit}")
+            continue
+        logger.info(f"Analyzing commit {number}/{len(commits)}: {commit}")
+        git_diff_extractor.set_commits(parent, commit)
+        source = GitTreeSource(git_diff_extractor.repo_path, commit, git_diff_extractor.get_object_reader())
+        report_path = analyze_commit(repo_path, git_diff_extractor, f"{base_filename}-{number:03d}-{commit[:8]}{extension}",
+                                     top_k, source, parsed_files)
+        if report_path:
+            report_paths.append(report_path)
+    return report_paths
+
+def run_analysis(repo_url: str, from_commit: str = "HEAD^", to_commit: str = "HEAD", keep_repo: bool = False,
+                 output_filename: str = "report", top_k: int = 20, clone_mode: str = "full", depth: int = None,
+                 commit_range: bool = False, parsed_files: Dict[str, FileSymbols] = None) -> List[str]:
+    """Analyze repository changes and write test suggestion reports, returning their paths.
 
+    With commit_range, every commit of from_commit..to_commit is analyzed on its
+    own. parsed_files carries the parsed files over to the next call of a
+    long-running process (see process_test_files).
+    """
+    output_filename += ".md"
+    
+    # Initialize git diff extractor
+    logger.info(f"Initializing GitDiffExtractor for {repo_url}")
+    git_diff_extractor = GitDiffExtractor(repo_url, from_commit, to_commit, keep_repo, clone_mode, depth)
+    repo_path = git_diff_extractor.repo_path
+    try:
+        if commit_range:
+            return analyze_commit_range(repo_path, git_diff_extractor, output_filename, top_k, parsed_files)
+        # Files are read at to_commit from the object database: a clone's working tree is at the branch tip,
+        # and local repositories and cached mirrors have none to use
+        source = GitTreeSource(git_diff_extractor.repo_path, to_commit, git_diff_extractor.get_object_reader())
+        report_path = analyze_commit(repo_path, git_diff_extractor, output_filename, top_k, source, parsed_files)
+        return [report_path] if report_path else []
+    finally:
+        git_diff_extractor.close()
+
+def main(repo_url: str, from_commit: str, to_commit: str, keep_repo: bool, output_filename: str, top_k: int = 20,
+         clone_mode: str = "full", depth: int = None, commit_range: bool = False):
+    """Main function to analyze repository changes and generate test suggestions."""
+    try:
+        run_analysis(repo_url, from_commit, to_commit, keep_repo, output_filename, top_k, clone_mode, depth, commit_range)
     except Exception as e:
         logger.error(f"Error in main process: {str(e)}")
         raise
@@ -217,7 +381,16 @@ if __name__ == "__main__":
     parser.add_argument("--to", dest="to_commit", default="HEAD", help="Target commit (default: HEAD)")
     parser.add_argument("--keep", action="store_true", help="Keep cloned repo after diff (default: delete)")
     parser.add_argument("--output", default="report", help="Output filename without extension (default: report)")
+    parser.add_argument("--clone-mode", dest="clone_mode", choices=CLONE_MODES, default="full", help="partial fetches only the commits, trees and Python files needed; local reads repo_url as a local repository path without cloning; mirror keeps a bare mirror in the cache directory and only fetches new commits (default: full)")
+    parser.add_argument("--depth", type=int, help="History depth of a partial clone (default: full history)")
+    parser.add_argument("--range", dest="commit_range", action="store_true", help="Analyze every commit of --from..--to on its own, writing one report per commit (default: one report for the whole diff)")
+    parser.add_argument("--top-k", dest="top_k", type=int, default=20, help="Number of related test functions retrieved from the index (default: 20)")
+    parser.add_argument("--embedding-provider", dest="embedding_provider", choices=list(PROVIDERS), default="gemini", help="Embedding backend; local needs no network (default: gemini)")
+    parser.add_argument("--embed-concurrency", dest="embed_concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Number of concurrent embedding requests (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rpm", type=int, help="Embedding requests per minute quota (default: unlimited)")
+    parser.add_argument("--tpm", type=int, help="Embedding tokens per minute quota (default: unlimited)")
     
     args = parser.parse_args()
     
-    main(args.repo_url, args.from_commit, args.to_commit, args.keep, args.output) 
\ No newline at end of file
+    configure_embedding_provider(args.embedding_provider, args.embed_concurrency, args.rpm, args.tpm)
+    main(args.repo_url, args.from_commit, args.to_commit, args.keep, args.output, args.top_k, args.clone_mode, args.depth, args.commit_range) 
\ No newline at end of file
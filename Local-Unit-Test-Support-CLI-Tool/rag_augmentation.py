@@ -8,7 +8,7 @@ def augment_test_suggestion_prompt(affected_metadata_list: List[Dict], whole_tes
     Given:
     - List of metadata of test function affected by git diff: {affected_metadata_list}
     - Git diff message: {git_diff_message}
-    - All test Code: {whole_test_code}
+    - Related test code: {whole_test_code}
     Suggest if any test should be added, modified, or deleted.
     """
 
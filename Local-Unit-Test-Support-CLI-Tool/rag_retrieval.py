@@ -1,65 +1,342 @@
 import os
 import json
-import numpy as np
-import faiss
-from google import genai
-from google.genai.types import EmbedContentConfig
-from dotenv import load_dotenv
+import math
+import hashlib
+import threading
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple, Iterable
+from cache import EmbeddingCache, get_cache_dir, hash_text
+from metadata_store import MetadataStore
+from embedding_executor import DEFAULT_CONCURRENCY
+from embedding_providers import EmbeddingProvider, create_provider
 
-def get_embedding(text: str):
-    """Get embedding for text using Gemini model."""
+# faiss and numpy are imported by the functions that use them, so runs that never
+# touch the index do not pay for importing them
+
+_embedding_cache = None
+_embedding_provider = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the shared on-disk embedding cache for the current cache directory."""
+    global _embedding_cache
+    path = get_cache_dir() / "embeddings.sqlite"
+    if _embedding_cache is None or _embedding_cache.path != path:
+        _embedding_cache = EmbeddingCache(path)
+    return _embedding_cache
+
+def configure_embedding_provider(name: str = "gemini", max_concurrency: int = DEFAULT_CONCURRENCY,
+                                 rpm: int = None, tpm: int = None) -> EmbeddingProvider:
+    """Select the embedding provider, and for remote providers the concurrency and requests/tokens per minute quota."""
+    global _embedding_provider
+    _embedding_provider = create_provider(name, max_concurrency, rpm, tpm)
+    return _embedding_provider
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Return the current embedding provider, the Gemini API unless configured otherwise."""
+    if _embedding_provider is None:
+        return configure_embedding_provider()
+    return _embedding_provider
+
+def get_embeddings(texts: List[str], use_cache: bool = True) -> List[List[float]]:
+    """Get embeddings for many texts, returned in input order.
+
+    Unchanged code is served from the on-disk cache; only texts whose hash is
+    not cached for the current provider's model and task type are embedded.
+    """
     try:
-        load_dotenv()
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-            
-        client = genai.Client(api_key=api_key)
-        response = client.models.embed_content(
-            model="text-embedding-004",
-            contents=[text],
-            config=EmbedContentConfig(
-                task_type="RETRIEVAL_QUERY",
-            ),
-        )
-        return response.embeddings[0].values
+        provider = get_embedding_provider()
+        hashes = [hash_text(text) for text in texts]
+        cache = get_embedding_cache() if use_cache else None
+        vectors = cache.get_many(provider.model, provider.task_type, set(hashes)) if cache else {}
+
+        missing = {}
+        for text, code_hash in zip(texts, hashes):
+            if code_hash not in vectors and code_hash not in missing:
+                missing[code_hash] = text
+        if missing:
+            new_vectors = dict(zip(missing.keys(), provider.embed(list(missing.values()))))
+            if cache:
+                cache.put_many(provider.model, provider.task_type, new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[code_hash] for code_hash in hashes]
     except Exception as e:
-        print(f"Error getting embedding: {str(e)}")
+        print(f"Error getting embeddings: {str(e)}")
         raise
 
-def save_to_faiss(embeddings: List, metadata: Dict, save_path: str = "index.faiss", meta_path: str = "metadata.json"):
-    """Save embeddings to FAISS index and metadata to JSON file."""
+def get_embedding(text: str):
+    """Get embedding for text using the current embedding provider."""
+    return get_embeddings([text])[0]
+
+def symbol_id(file_path: str, symbol_name: str) -> int:
+    """Return a stable 63-bit FAISS ID for a (file_path, symbol_name) key."""
+    digest = hashlib.sha1(f"{file_path}\0{symbol_name}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
+def get_manifest_path(index_path: str) -> str:
+    """Return the path of the manifest stored next to a FAISS index."""
+    return str(Path(index_path).with_suffix(".manifest.json"))
+
+def load_manifest(index_path: str) -> Dict:
+    """Load the manifest describing an index, or an empty dict if there is none."""
+    manifest_path = get_manifest_path(index_path)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read manifest {manifest_path}: {str(e)}")
+        return {}
+
+def save_manifest(index_path: str, manifest: Dict):
+    """Save the manifest describing an index."""
+    with open(get_manifest_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+def load_metadata(meta_path: str = "metadata.db") -> MetadataStore:
+    """Open the metadata store, keyed by (file_path, symbol_name). The caller closes it."""
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"Metadata store not found: {meta_path}")
+    return MetadataStore(meta_path)
+
+def save_metadata(metadata: Dict, meta_path: str = "metadata.db"):
+    """Replace the contents of the metadata store with the given code blocks."""
+    with MetadataStore(meta_path) as store:
+        store.clear()
+        store.upsert({symbol_id(*key): value for key, value in metadata.items()})
+
+INDEX_TYPES = ["auto", "flat", "ivf_flat", "ivf_pq", "hnsw"]
+# Corpus sizes at which exact search stops being practical
+IVF_MIN_VECTORS = 50_000
+PQ_MIN_VECTORS = 1_000_000
+
+def choose_index_type(num_vectors: int) -> str:
+    """Pick an index type from the corpus size."""
+    if num_vectors < IVF_MIN_VECTORS:
+        return "flat"
+    if num_vectors < PQ_MIN_VECTORS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+def create_faiss_index(vectors, index_type: str = "auto", index_params: Dict = None) -> Tuple[object, Dict]:
+    """Create and train a FAISS index of the given type for the vectors.
+
+    Supported types are flat, ivf_flat, ivf_pq and hnsw, or auto to pick one from
+    the number of vectors. index_params may set nlist, nprobe, pq_m, hnsw_m and
+    ef_search. Returns the ID-mapped index and the parameters it was built with.
+    """
+    import faiss
+    params = dict(index_params or {})
+    num_vectors, dim = vectors.shape
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        params.setdefault("hnsw_m", 32)
+        params.setdefault("ef_search", 64)
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        index.hnsw.efSearch = params["ef_search"]
+    else:
+        # Keep at least 39 training points per list, as FAISS recommends
+        params.setdefault("nlist", max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39)))
+        params.setdefault("nprobe", min(params["nlist"], 16))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, params["nlist"])
+        else:
+            # About 8 dimensions per sub-quantizer, and no more centroids than training points
+            params.setdefault("pq_m", max(m for m in range(1, dim // 8 + 1) if dim % m == 0))
+            params.setdefault("pq_nbits", max(1, min(8, int(math.log2(num_vectors)))))
+            index = faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["pq_m"], params["pq_nbits"])
+        index.train(vectors)
+        index.nprobe = params["nprobe"]
+    params["type"] = index_type
+    return faiss.IndexIDMap2(index), params
+
+def apply_search_params(index, index_params: Dict):
+    """Restore the search-time parameters an index was built with."""
+    import faiss
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if "nprobe" in index_params and isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = index_params["nprobe"]
+    if "ef_search" in index_params and isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = index_params["ef_search"]
+    return index
+
+def get_mmap_io_flags() -> List[int]:
+    """Return the FAISS IO flags to try, in order, for a read-only memory-mapped read.
+
+    Read-only memory mapping lets concurrent processes share the index through the page cache.
+    Flat and HNSW storage map with IO_FLAG_MMAP_IFC; IVF lists only support IO_FLAG_MMAP.
+    """
+    import faiss
+    return [
+        faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY,
+        faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+    ]
+
+def read_faiss_index(save_path: str = "index.faiss", mmap: bool = True):
+    """Read a FAISS index, memory-mapped read-only when the index type supports it."""
+    import faiss
+    if mmap:
+        for io_flags in get_mmap_io_flags():
+            try:
+                return faiss.read_index(str(save_path), io_flags)
+            except RuntimeError:
+                continue
+    return faiss.read_index(str(save_path))
+
+def write_faiss_index(index, save_path: str = "index.faiss") -> None:
+    """Write a FAISS index atomically, so processes that mapped the old file keep a consistent view."""
+    import faiss
+    tmp_path = f"{save_path}.tmp.{os.getpid()}"
+    try:
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, save_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_faiss_index(save_path: str = "index.faiss", mmap: bool = True):
+    """Load a FAISS index with the search parameters recorded in its manifest."""
+    index = read_faiss_index(save_path, mmap)
+    return apply_search_params(index, load_manifest(save_path).get("index", {}))
+
+class LazyFaissIndex:
+    """A FAISS index that is only read from disk when it is first searched.
+
+    The index is reloaded when the file on disk is replaced, e.g. by an index refresh.
+    """
+
+    def __init__(self, save_path: str = "index.faiss", mmap: bool = True):
+        self.save_path = str(save_path)
+        self.mmap = mmap
+        self.lock = threading.Lock()
+        self._index = None
+        self._file_stat = None
+
+    def _stat(self) -> Tuple[int, int, int]:
+        stat = os.stat(self.save_path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def get(self):
+        """Return the loaded index, reading it if it was not loaded yet or changed on disk."""
+        with self.lock:
+            file_stat = self._stat()
+            if self._index is None or file_stat != self._file_stat:
+                self._index = load_faiss_index(self.save_path, self.mmap)
+                self._file_stat = file_stat
+            return self._index
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._index is not None
+
+_lazy_indexes = {}
+
+def get_lazy_index(save_path: str = "index.faiss") -> LazyFaissIndex:
+    """Return the shared lazily loaded index for a path."""
+    key = os.path.abspath(save_path)
+    if key not in _lazy_indexes:
+        _lazy_indexes[key] = LazyFaissIndex(save_path)
+    return _lazy_indexes[key]
+
+def save_to_faiss(embeddings: List, metadata: Dict, save_path: str = "index.faiss", meta_path: str = "metadata.db",
+                  index_type: str = "auto", index_params: Dict = None) -> Dict:
+    """Save embeddings to FAISS index and metadata to the metadata store.
+
+    Returns the index type and parameters, to be stored in the index manifest.
+    """
+    import numpy as np
     try:
         if not embeddings:
             raise ValueError("No embeddings provided")
             
-        dim = len(embeddings[0])
-        index = faiss.IndexFlatL2(dim)
-        index.add(np.array(embeddings).astype("float32"))
-        faiss.write_index(index, save_path)
-
-        json_metadata = [
-            {
-                "file_path": key[0],
-                "symbol_name": key[1],
-                **value
-            }
-            for key, value in metadata.items()
-        ]
-
-        with open(meta_path, "w", encoding="utf-8") as f:
-            json.dump(json_metadata, f, ensure_ascii=False, indent=2)
+        vectors = np.array(embeddings).astype("float32")
+        index, params = create_faiss_index(vectors, index_type, index_params)
+        ids = np.array([symbol_id(*key) for key in metadata.keys()], dtype="int64")
+        index.add_with_ids(vectors, ids)
+        write_faiss_index(index, save_path)
+        save_metadata(metadata, meta_path)
+        return params
     except Exception as e:
         print(f"Error saving to FAISS: {str(e)}")
         raise
 
-def get_code_files(repo_path: str, include_pattern: str = "*.py", exclude_dirs: List[str] = ["venv", "__pycache__", "Local-Unit-Test-Support"]) -> List[Path]:
+def supports_incremental_update(save_path: str = "index.faiss") -> bool:
+    """Return True if the index on disk carries stable IDs and can be updated in place."""
+    import faiss
+    try:
+        index = read_faiss_index(save_path)
+    except Exception:
+        return False
+    # HNSW graphs do not support removing vectors
+    return isinstance(index, faiss.IndexIDMap) and not isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW)
+
+def update_faiss(removed_keys: Iterable[Tuple[str, str]], embeddings: List, added: Dict,
+                 save_path: str = "index.faiss", meta_path: str = "metadata.db"):
+    """Remove and add vectors in an existing FAISS index and apply the same changes to the metadata store."""
+    import numpy as np
+    try:
+        removed_keys = list(removed_keys)
+        # Updates need a writable copy of the index
+        index = read_faiss_index(save_path, mmap=False)
+        removed_ids = np.array([symbol_id(*key) for key in removed_keys], dtype="int64")
+        if len(removed_ids):
+            index.remove_ids(removed_ids)
+        if embeddings:
+            ids = np.array([symbol_id(*key) for key in added.keys()], dtype="int64")
+            index.add_with_ids(np.array(embeddings).astype("float32"), ids)
+        write_faiss_index(index, save_path)
+
+        with load_metadata(meta_path) as store:
+            store.delete(removed_keys)
+            store.upsert({symbol_id(*key): block for key, block in added.items()})
+    except Exception as e:
+        print(f"Error updating FAISS index: {str(e)}")
+        raise
+
+def search_index(query_embeddings: List, k: int = 10, save_path: str = "index.faiss") -> List[List[Tuple[int, float]]]:
+    """Search the FAISS index with a batch of query embeddings.
+
+    Returns, for each query, up to k (vector ID, L2 distance) pairs ordered by distance.
+    """
+    import numpy as np
+    if not query_embeddings:
+        return []
+    # The index is only read (memory-mapped) here, so runs without queries never touch it
+    index = get_lazy_index(save_path).get()
+    k = min(k, index.ntotal)
+    if k == 0:
+        return [[] for _ in query_embeddings]
+    distances, ids = index.search(np.array(query_embeddings).astype("float32"), k)
+    return [
+        [(int(i), float(d)) for i, d in zip(row_ids, row_distances) if i != -1]
+        for row_ids, row_distances in zip(ids, distances)
+    ]
+
+def is_test_file(file_path: str) -> bool:
+    """Return True if a path names a Python test file."""
+    filename = Path(file_path).name
+    return ("test_" in filename or "_test" in filename) and filename.endswith(".py")
+
+DEFAULT_EXCLUDE_DIRS = ["venv", "__pycache__", "Local-Unit-Test-Support"]
+
+def is_code_file(file_path: str, include_pattern: str = "*.py", exclude_dirs: List[str] = DEFAULT_EXCLUDE_DIRS) -> bool:
+    """Return True if a repository-relative path is a code file that should be indexed."""
+    path = Path(file_path)
+    return fnmatch(path.name, include_pattern) and not any(ex in path.parts for ex in exclude_dirs)
+
+def get_code_files(repo_path: str, include_pattern: str = "*.py", exclude_dirs: List[str] = DEFAULT_EXCLUDE_DIRS) -> List[Path]:
     """Get all Python files in the repository, excluding specified directories."""
     repo = Path(repo_path).resolve()
     code_files = []
     for file in repo.rglob(include_pattern):
         if not any(ex in file.parts for ex in exclude_dirs):
             code_files.append(file)
-    return code_files 
\ No newline at end of file
+    return code_files
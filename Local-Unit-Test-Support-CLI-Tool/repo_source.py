@@ -0,0 +1,150 @@
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from rag_retrieval import get_code_files, is_code_file, DEFAULT_EXCLUDE_DIRS
+from ast_parser import (
+    FileSymbols, extract_all_code_blocks, iter_source_code_blocks, iter_parsed_files, get_cached_symbols
+)
+from diff_extractor import GitObjectReader, get_head_commit, compute_blob_sha
+
+def load_symbols(source, blob_shas: Dict[str, str], parsed: Dict[str, FileSymbols] = None, workers: int = None) -> Dict[str, FileSymbols]:
+    """Return the parsed symbols of files given by {path: blob SHA}, skipping files that do not parse.
+
+    parsed maps blob SHAs to symbols loaded before (e.g. for the previous commit of
+    a range) and is updated to hold just these files; other blobs come from the
+    parse cache, and only those missing from it are read and parsed, with up to
+    workers processes.
+    """
+    parsed = {} if parsed is None else parsed
+    missing = []
+    for path, blob_sha in blob_shas.items():
+        if blob_sha not in parsed:
+            symbols = get_cached_symbols(blob_sha)
+            if symbols is not None:
+                parsed[blob_sha] = symbols
+            else:
+                missing.append((path, source.read_bytes(path), blob_sha))
+    for path, symbols in iter_parsed_files(missing, workers):
+        if symbols is not None:
+            parsed[blob_shas[path]] = symbols
+    for blob_sha in set(parsed) - set(blob_shas.values()):
+        del parsed[blob_sha]
+    return {path: parsed[blob_sha] for path, blob_sha in blob_shas.items() if blob_sha in parsed}
+
+class WorkingTreeSource:
+    """The files of a repository's working tree."""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = Path(repo_path).resolve()
+
+    @property
+    def commit(self) -> Optional[str]:
+        return get_head_commit(str(self.repo_path))
+
+    def list_files(self, include_pattern: str = "*.py", exclude_dirs: List[str] = DEFAULT_EXCLUDE_DIRS) -> List[str]:
+        """Return the repository-relative paths of the files matching include_pattern."""
+        return [str(file.relative_to(self.repo_path)) for file in get_code_files(str(self.repo_path), include_pattern, exclude_dirs)]
+
+    def exists(self, path: str) -> bool:
+        return (self.repo_path / path).is_file()
+
+    def read_bytes(self, path: str) -> Optional[bytes]:
+        try:
+            return (self.repo_path / path).read_bytes()
+        except OSError:
+            return None
+
+    def read_text(self, path: str) -> Optional[str]:
+        data = self.read_bytes(path)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def file_hashes(self, paths: List[str]) -> Dict[str, str]:
+        """Return the git blob SHA of each file."""
+        return {path: compute_blob_sha((self.repo_path / path).read_bytes()) for path in paths}
+
+    def extract_code_blocks(self, paths: List[str], workers: int = None) -> Dict:
+        """Extract the code blocks of the given files, in the order of paths."""
+        return extract_all_code_blocks([self.repo_path / path for path in paths], str(self.repo_path), workers)
+
+    def load_symbols(self, paths: List[str], parsed: Dict[str, FileSymbols] = None, workers: int = None) -> Dict[str, FileSymbols]:
+        """Return the parsed symbols of the given files (see load_symbols)."""
+        return load_symbols(self, self.file_hashes(paths), parsed, workers)
+
+class GitTreeSource:
+    """The files of a commit, read from the repository's object database.
+
+    Nothing is cloned or checked out: files are listed with `git ls-tree` and read
+    through a persistent `git cat-file --batch` process.
+    """
+
+    def __init__(self, repo_path: str, commit: str = "HEAD", object_reader: GitObjectReader = None):
+        self.repo_path = Path(repo_path).resolve()
+        self.commit = get_head_commit(str(self.repo_path), commit)
+        if self.commit is None:
+            raise ValueError(f"Commit {commit} not found in {self.repo_path}")
+        self.object_reader = object_reader or GitObjectReader(str(self.repo_path))
+        self._tree = None
+
+    @property
+    def tree(self) -> Dict[str, str]:
+        """Map every regular file of the commit to its blob SHA."""
+        if self._tree is None:
+            cmd = ["git", "-C", str(self.repo_path), "ls-tree", "-r", "-z", "--full-tree", self.commit]
+            result = subprocess.run(cmd, capture_output=True, check=True)
+            tree = {}
+            for entry in result.stdout.split(b"\0"):
+                if not entry:
+                    continue
+                info, path = entry.split(b"\t", 1)
+                mode, object_type, sha = info.split()
+                # Skip submodules and symlinks
+                if object_type == b"blob" and mode != b"120000":
+                    tree[path.decode("utf-8", errors="surrogateescape")] = sha.decode()
+            self._tree = tree
+        return self._tree
+
+    def list_files(self, include_pattern: str = "*.py", exclude_dirs: List[str] = DEFAULT_EXCLUDE_DIRS) -> List[str]:
+        """Return the repository-relative paths of the files matching include_pattern."""
+        return sorted(path for path in self.tree if is_code_file(path, include_pattern, exclude_dirs))
+
+    def exists(self, path: str) -> bool:
+        return path in self.tree
+
+    def read_bytes(self, path: str) -> Optional[bytes]:
+        blob_sha = self.tree.get(path)
+        return self.object_reader.read(blob_sha) if blob_sha else None
+
+    def read_text(self, path: str) -> Optional[str]:
+        data = self.read_bytes(path)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def file_hashes(self, paths: List[str]) -> Dict[str, str]:
+        """Return the git blob SHA of each file, straight from the tree."""
+        return {path: self.tree[path] for path in paths}
+
+    def extract_code_blocks(self, paths: List[str], workers: int = None) -> Dict:
+        """Extract the code blocks of the given files, in the order of paths.
+
+        Blobs found in the parse cache are not even read; the others are read
+        through cat-file and parsed with up to workers processes.
+        """
+        by_file = {}
+        missing = []
+        for path in paths:
+            symbols = get_cached_symbols(self.tree[path])
+            if symbols is not None:
+                by_file[path] = symbols.code_blocks(path)
+            else:
+                missing.append(path)
+        sources = [(path, self.read_bytes(path), self.tree[path]) for path in missing]
+        by_file.update(iter_source_code_blocks(sources, workers))
+
+        code_blocks = {}
+        for path in paths:
+            code_blocks.update(by_file[path])
+        return code_blocks
+
+    def load_symbols(self, paths: List[str], parsed: Dict[str, FileSymbols] = None, workers: int = None) -> Dict[str, FileSymbols]:
+        """Return the parsed symbols of the given files (see load_symbols)."""
+        return load_symbols(self, self.file_hashes(paths), parsed, workers)
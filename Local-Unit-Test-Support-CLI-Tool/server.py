@@ -0,0 +1,138 @@
+"""Resident analysis server speaking JSON-RPC 2.0 over stdin/stdout.
+
+Each request and response is one JSON object on its own line. The process keeps
+its imports, the loaded index, the parse and embedding caches, the API clients
+and the parsed files of every analyzed repository between requests, so
+only the first request pays for starting up.
+
+Methods:
+    analyze   params: repo_path or repo_url, from, to, output, top_k, clone_mode,
+              depth, range, keep. Returns {"reports": [report paths]}.
+    ping      Returns "pong".
+    shutdown  Returns null, then the server exits.
+
+Anything the pipeline prints goes to stderr, keeping stdout for the protocol.
+"""
+import sys
+import json
+import logging
+import argparse
+from typing import Dict, Optional, TextIO
+
+from main import run_analysis
+from diff_extractor import CLONE_MODES
+from rag_retrieval import configure_embedding_provider
+from embedding_executor import DEFAULT_CONCURRENCY
+from embedding_providers import PROVIDERS
+
+logger = logging.getLogger(__name__)
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+class RequestError(Exception):
+    """An error reported to the client as a JSON-RPC error object."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+class AnalysisServer:
+    def __init__(self, reader: TextIO, writer: TextIO):
+        self.reader = reader
+        self.writer = writer
+        self.running = True
+        # Parsed files of each repository, reused by the next analysis
+        self.parsed_files = {}
+        self.methods = {
+            "analyze": self.analyze,
+            "ping": self.ping,
+            "shutdown": self.shutdown,
+        }
+
+    def analyze(self, params: Dict) -> Dict:
+        repo = params.get("repo_path") or params.get("repo_url")
+        if not repo:
+            raise RequestError(INVALID_PARAMS, "analyze needs repo_path or repo_url")
+        # A path is read in place unless another clone mode is asked for
+        clone_mode = params.get("clone_mode") or ("local" if params.get("repo_path") else "full")
+        if clone_mode not in CLONE_MODES:
+            raise RequestError(INVALID_PARAMS, f"Unknown clone mode: {clone_mode}")
+        reports = run_analysis(
+            repo,
+            params.get("from", "HEAD^"),
+            params.get("to", "HEAD"),
+            bool(params.get("keep", False)),
+            params.get("output", "report"),
+            int(params.get("top_k", 20)),
+            clone_mode,
+            params.get("depth"),
+            bool(params.get("range", False)),
+            self.parsed_files.setdefault(repo, {}),
+        )
+        return {"reports": reports}
+
+    def ping(self, params: Dict) -> str:
+        return "pong"
+
+    def shutdown(self, params: Dict) -> None:
+        self.running = False
+        return None
+
+    def handle(self, line: str) -> Optional[Dict]:
+        """Handle one request line, returning the response (None for notifications)."""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(e)}}
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RequestError(INVALID_REQUEST, "Request must be an object with a method")
+            method = self.methods.get(request["method"])
+            if method is None:
+                raise RequestError(METHOD_NOT_FOUND, f"Unknown method: {request['method']}")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise RequestError(INVALID_PARAMS, "params must be an object")
+            result = method(params)
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RequestError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            logger.exception(f"Error handling {request.get('method')}")
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": INTERNAL_ERROR, "message": str(e)}}
+        # Notifications (requests without an id) get no response
+        return response if not isinstance(request, dict) or "id" in request else None
+
+    def serve(self) -> None:
+        """Answer requests until shutdown or the end of input."""
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        try:
+            for line in self.reader:
+                if not line.strip():
+                    continue
+                response = self.handle(line)
+                if response is not None:
+                    self.writer.write(json.dumps(response) + "\n")
+                    self.writer.flush()
+                if not self.running:
+                    break
+        finally:
+            sys.stdout = stdout
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve test maintenance analyses over stdin/stdout JSON-RPC")
+    parser.add_argument("--embedding-provider", dest="embedding_provider", choices=list(PROVIDERS), default="gemini", help="Embedding backend; local needs no network (default: gemini)")
+    parser.add_argument("--embed-concurrency", dest="embed_concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Number of concurrent embedding requests (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rpm", type=int, help="Embedding requests per minute quota (default: unlimited)")
+    parser.add_argument("--tpm", type=int, help="Embedding tokens per minute quota (default: unlimited)")
+
+    args = parser.parse_args()
+
+    configure_embedding_provider(args.embedding_provider, args.embed_concurrency, args.rpm, args.tpm)
+    AnalysisServer(sys.stdin, sys.stdout).serve()
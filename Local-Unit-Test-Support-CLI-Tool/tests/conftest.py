@@ -1,8 +1,8 @@
 import os
+import subprocess
 import pytest
 import sys
 sys.path.append('../')
-from pathlib import Path
 from unittest.mock import patch, MagicMock
 
 @pytest.fixture(scope="session")
@@ -10,6 +10,51 @@ def test_dir(tmp_path_factory):
     """Create a temporary directory for all tests."""
     return tmp_path_factory.mktemp("test_dir")
 
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Keep persistent caches out of the user's home directory."""
+    monkeypatch.setenv("COVERIQ_CACHE_DIR", str(tmp_path / "cache"))
+    yield tmp_path / "cache"
+
+def run_git(repo_path, *args) -> str:
+    """Run git in a repository and return its output."""
+    return subprocess.run(["git", "-C", str(repo_path), *args], capture_output=True, text=True, check=True).stdout.strip()
+
+@pytest.fixture
+def git():
+    """Return a function running git in a repository: git(repo_path, *args)."""
+    return run_git
+
+@pytest.fixture
+def make_git_repo(tmp_path):
+    """Return a function creating an empty git repository under tmp_path, with a committer identity."""
+    def make_git_repo(name="repo"):
+        repo_path = tmp_path / name
+        repo_path.mkdir()
+        run_git(repo_path, "init", "-q")
+        run_git(repo_path, "config", "user.email", "test@example.com")
+        run_git(repo_path, "config", "user.name", "Test")
+        return repo_path
+    return make_git_repo
+
+@pytest.fixture
+def git_repo(make_git_repo):
+    """Create an empty git repository in tmp_path/repo."""
+    return make_git_repo()
+
+@pytest.fixture
+def commit():
+    """Return a function writing files into a repository and committing them, returning the commit SHA."""
+    def commit(repo_path, files, message="change"):
+        for name, code in files.items():
+            path = repo_path / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(code)
+        run_git(repo_path, "add", "-A")
+        run_git(repo_path, "commit", "-q", "-m", message)
+        return run_git(repo_path, "rev-parse", "HEAD")
+    return commit
+
 @pytest.fixture
 def mock_env_vars():
     """Mock environment variables for testing."""
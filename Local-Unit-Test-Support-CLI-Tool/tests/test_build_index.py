@@ -0,0 +1,219 @@
+import pytest
+import faiss
+from unittest.mock import patch
+from build_index import build_index, refresh_index
+from rag_retrieval import load_manifest, load_metadata, save_manifest, symbol_id
+from embedding_providers import LocalEmbeddingProvider
+from ast_parser import extract_code_blocks
+from repo_source import GitTreeSource
+
+@pytest.fixture
+def git_repo(git_repo, commit):
+    """Create a git repository with two committed Python files."""
+    commit(git_repo, {
+        "math_utils.py": "def add(x, y):\n    return x + y\n\ndef sub(x, y):\n    return x - y\n",
+        "strings.py": "def pad(x):\n    return str(x).zfill(3)\n",
+    }, "initial")
+    return git_repo
+
+def fake_embeddings(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+def test_build_index_records_commit(git_repo, tmp_path, git):
+    """Test a full build stores every block under stable IDs and records the commit."""
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        code_blocks = build_index(str(git_repo), index_path, meta_path)
+
+    assert len(code_blocks) == 3
+    assert load_manifest(index_path)["commit"] == git(git_repo, "rev-parse", "HEAD")
+    index = faiss.read_index(index_path)
+    assert index.ntotal == 3
+    assert symbol_id("math_utils.py", "add") in set(faiss.vector_to_array(index.id_map))
+
+def test_refresh_index_only_embeds_changed_symbols(git_repo, tmp_path, git, commit):
+    """Test an incremental refresh re-embeds only new or modified symbols."""
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        build_index(str(git_repo), index_path, meta_path)
+
+    (git_repo / "strings.py").unlink()
+    commit(git_repo, {
+        "math_utils.py": "def add(x, y):\n    return x + y\n\ndef sub(x, y):\n    return y - x\n",
+        "more.py": "def mul(x, y):\n    return x * y\n",
+    })
+
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings) as mock_embed:
+        code_blocks = refresh_index(str(git_repo), index_path, meta_path)
+
+    embedded = mock_embed.call_args.args[0]
+    assert sorted(embedded) == sorted(["def sub(x, y):\n    return y - x", "def mul(x, y):\n    return x * y"])
+    assert set(code_blocks) == {("math_utils.py", "add"), ("math_utils.py", "sub"), ("more.py", "mul")}
+    assert set(load_metadata(meta_path)) == set(code_blocks)
+    assert load_manifest(index_path)["commit"] == git(git_repo, "rev-parse", "HEAD")
+    index = faiss.read_index(index_path)
+    assert set(faiss.vector_to_array(index.id_map)) == {symbol_id(*key) for key in code_blocks}
+
+def test_refresh_index_up_to_date(git_repo, tmp_path):
+    """Test refreshing an index at the current commit embeds nothing."""
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        build_index(str(git_repo), index_path, meta_path)
+
+    with patch("build_index.get_embeddings") as mock_embed:
+        code_blocks = refresh_index(str(git_repo), index_path, meta_path)
+    mock_embed.assert_not_called()
+    assert len(code_blocks) == 3
+
+def test_build_index_manifest_binds_repo(git_repo, tmp_path, git):
+    """Test the index records the repository identity and per-file blob hashes."""
+    index_path = str(tmp_path / "index.faiss")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        store = build_index(str(git_repo), index_path, str(tmp_path / "metadata.db"))
+
+    manifest = load_manifest(index_path)
+    assert manifest["repo"]["root_commit"] == git(git_repo, "rev-list", "--max-parents=0", "HEAD")
+    assert store.get_file_hashes() == {
+        "math_utils.py": git(git_repo, "rev-parse", "HEAD:math_utils.py"),
+        "strings.py": git(git_repo, "rev-parse", "HEAD:strings.py"),
+    }
+
+def test_refresh_index_only_updates_drifted_files(git_repo, tmp_path):
+    """Test uncommitted edits are detected by blob hash and only that file is re-indexed."""
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        build_index(str(git_repo), index_path, meta_path)
+
+    (git_repo / "strings.py").write_text("def pad(x):\n    return str(x).zfill(5)\n")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings) as mock_embed, \
+            patch("ast_parser.extract_code_blocks", wraps=extract_code_blocks) as mock_extract:
+        code_blocks = refresh_index(str(git_repo), index_path, meta_path)
+
+    assert [call.args[0].name for call in mock_extract.call_args_list] == ["strings.py"]
+    mock_embed.assert_called_once_with(["def pad(x):\n    return str(x).zfill(5)"])
+    assert code_blocks[("strings.py", "pad")]["code"].endswith("zfill(5)")
+
+def test_refresh_index_rebuilds_for_other_repository(git_repo, tmp_path, git, commit, make_git_repo):
+    """Test an index built from another repository is not reused."""
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        build_index(str(git_repo), index_path, meta_path)
+
+    other_repo = make_git_repo("other")
+    commit(other_repo, {"app.py": "def run():\n    return 1\n"}, "initial")
+
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        code_blocks = refresh_index(str(other_repo), index_path, meta_path)
+
+    assert set(code_blocks) == {("app.py", "run")}
+    assert load_manifest(index_path)["repo"]["root_commit"] == git(other_repo, "rev-parse", "HEAD")
+
+def test_refresh_index_keeps_index_type(git_repo, tmp_path):
+    """Test an HNSW index is rebuilt with its stored parameters when files drift."""
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        build_index(str(git_repo), index_path, meta_path, "hnsw", {"hnsw_m": 8, "ef_search": 20})
+
+    (git_repo / "strings.py").write_text("def pad(x):\n    return str(x).zfill(5)\n")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        code_blocks = refresh_index(str(git_repo), index_path, meta_path)
+
+    assert code_blocks[("strings.py", "pad")]["code"].endswith("zfill(5)")
+    assert load_manifest(index_path)["index"] == {"type": "hnsw", "hnsw_m": 8, "ef_search": 20}
+    index = faiss.read_index(index_path)
+    assert isinstance(faiss.downcast_index(index.index), faiss.IndexHNSWFlat)
+
+
+def test_refresh_index_rebuilds_for_another_embedding_model(git_repo, tmp_path, monkeypatch):
+    """Test an index embedded with another provider is rebuilt with the current one."""
+    monkeypatch.setattr("rag_retrieval._embedding_provider", LocalEmbeddingProvider())
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    build_index(str(git_repo), index_path, meta_path)
+    assert load_manifest(index_path)["embedding"]["provider"] == "local"
+
+    manifest = load_manifest(index_path)
+    manifest["embedding"] = {"provider": "gemini", "model": "text-embedding-004", "task_type": "RETRIEVAL_QUERY"}
+    save_manifest(index_path, manifest)
+    with patch("build_index.build_index", wraps=build_index) as mock_build:
+        refresh_index(str(git_repo), index_path, meta_path)
+
+    mock_build.assert_called_once()
+    assert load_manifest(index_path)["embedding"]["provider"] == "local"
+
+def test_refresh_index_rebuilds_for_another_parser_version(git_repo, tmp_path):
+    """Test an index built by an older parser is rebuilt with qualified symbol names."""
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        build_index(str(git_repo), index_path, meta_path)
+    manifest = load_manifest(index_path)
+    del manifest["parser"]
+    save_manifest(index_path, manifest)
+
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings), \
+            patch("build_index.build_index", wraps=build_index) as mock_build:
+        refresh_index(str(git_repo), index_path, meta_path)
+
+    mock_build.assert_called_once()
+    assert "parser" in load_manifest(index_path)
+
+def test_build_index_from_git_tree_source(git_repo, tmp_path, git):
+    """Test a commit is indexed straight from the object database, ignoring the working tree."""
+    (git_repo / "strings.py").write_text("def pad(x):\n    return str(x).zfill(5)\n")
+    git(git_repo, "commit", "-q", "-am", "pad to 5")
+    (git_repo / "strings.py").write_text("def pad(x):\n    return 'uncommitted'\n")
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        build_index(str(git_repo), index_path, meta_path, source=GitTreeSource(str(git_repo), "HEAD^"))
+
+    assert load_manifest(index_path)["commit"] == git(git_repo, "rev-parse", "HEAD^")
+    assert load_metadata(meta_path)[("strings.py", "pad")]["code"].endswith("zfill(3)")
+
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings) as mock_embed:
+        code_blocks = refresh_index(str(git_repo), index_path, meta_path, source=GitTreeSource(str(git_repo)))
+    mock_embed.assert_called_once_with(["def pad(x):\n    return str(x).zfill(5)"])
+    assert code_blocks[("strings.py", "pad")]["code"].endswith("zfill(5)")
+    assert load_manifest(index_path)["commit"] == git(git_repo, "rev-parse", "HEAD")
+
+def test_refresh_index_updates_impacts(git_repo, tmp_path, git, commit):
+    """Test the reverse dependency index and call edges follow calls across files and match a rebuild after a refresh."""
+    commit(git_repo, {
+        "calc.py": "from math_utils import add, sub\n\ndef total(xs):\n    return add(xs[0], xs[1])\n",
+        "test_calc.py": (
+            "from calc import total\nfrom strings import pad\n\n"
+            "def test_total():\n    total([1, 2])\n\ndef test_pad():\n    pad(1)\n"
+        ),
+    }, "tests")
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        store = build_index(str(git_repo), index_path, meta_path)
+    assert store.get_impacted_tests([("math_utils.py", "add")]) == {("test_calc.py", "test_total")}
+    assert store.get_impacted_tests([("math_utils.py", "sub"), ("strings.py", "pad")]) == {("test_calc.py", "test_pad")}
+    assert store.get_callers([("math_utils.py", "add")]) == {("calc.py", "total")}
+
+    (git_repo / "calc.py").write_text("from math_utils import add, sub\n\ndef total(xs):\n    return sub(xs[0], xs[1])\n")
+    (git_repo / "strings.py").write_text("def other():\n    pass\n")
+    git(git_repo, "commit", "-q", "-am", "change")
+    with patch("build_index.get_embeddings", side_effect=fake_embeddings):
+        store = refresh_index(str(git_repo), index_path, meta_path)
+        rebuilt = build_index(str(git_repo), str(tmp_path / "rebuilt.faiss"), str(tmp_path / "rebuilt.db"))
+
+    symbols = [("math_utils.py", "add"), ("math_utils.py", "sub"), ("calc.py", "total")]
+    for symbol in symbols:
+        assert store.get_impacted_tests([symbol]) == rebuilt.get_impacted_tests([symbol])
+        assert store.get_callers([symbol]) == rebuilt.get_callers([symbol])
+    assert store.get_callers([("math_utils.py", "sub")]) == {("calc.py", "total")}
+    assert store.get_callers([("math_utils.py", "add")]) == set()
+    assert store.get_impacted_tests([("math_utils.py", "sub")]) == {("test_calc.py", "test_total")}
+    assert store.get_impacted_tests([("math_utils.py", "add")]) == set()
+    # The deleted pad stays a target of the tests still calling it
+    assert store.get_impacted_tests([("strings.py", "pad")]) == {("test_calc.py", "test_pad")}
@@ -0,0 +1,35 @@
+from cache import EmbeddingCache, ParseCache, get_cache_dir, hash_text
+
+def test_get_cache_dir(isolated_cache_dir):
+    """Test the cache directory honours COVERIQ_CACHE_DIR."""
+    assert get_cache_dir() == isolated_cache_dir
+
+def test_hash_text():
+    """Test hashing is stable and content-addressed."""
+    assert hash_text("def f():\n    pass") == hash_text("def f():\n    pass")
+    assert hash_text("def f():\n    pass") != hash_text("def g():\n    pass")
+
+def test_embedding_cache_roundtrip(tmp_path):
+    """Test storing and loading vectors from the embedding cache."""
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    cache.put_many("model", "TASK", {"abc": [0.5, 1.0], "def": [2.0, -1.0]})
+
+    found = cache.get_many("model", "TASK", ["abc", "def", "missing"])
+    assert found == {"abc": [0.5, 1.0], "def": [2.0, -1.0]}
+    assert cache.get_many("other-model", "TASK", ["abc"]) == {}
+    cache.close()
+
+    reopened = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    assert reopened.get_many("model", "TASK", ["abc"]) == {"abc": [0.5, 1.0]}
+
+def test_parse_cache_roundtrip(tmp_path):
+    """Test parse results are stored per blob SHA and parser version."""
+    cache = ParseCache(tmp_path / "parse.sqlite")
+    data = {"symbols": {"f": {"code": "def f():\n    pass"}}, "calls": {"f": []}}
+    cache.put("abc", 2, data)
+
+    assert cache.get("abc", 2) == data
+    assert cache.get("abc", 3) is None
+    assert cache.get("missing", 2) is None
+    cache.close()
+    assert ParseCache(tmp_path / "parse.sqlite").get("abc", 2) == data
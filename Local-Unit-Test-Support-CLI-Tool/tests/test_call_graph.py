@@ -0,0 +1,92 @@
+from ast_parser import parse_source
+from call_graph import RepoCallGraph, module_name, build_repo_call_graph
+from repo_source import WorkingTreeSource
+
+def make_graph(files, removed=()):
+    return RepoCallGraph({path: parse_source(code) for path, code in files.items()}, removed)
+
+def test_module_name():
+    """Test file paths map to the module names they are imported by."""
+    assert module_name("pkg/mod.py") == "pkg.mod"
+    assert module_name("pkg/__init__.py") == "pkg"
+    assert module_name("top.py") == "top"
+
+def test_resolves_imports_across_modules():
+    """Test calls are followed through absolute, relative, aliased and re-exported imports."""
+    graph = make_graph({
+        "src/shop/__init__.py": "from .models import Order\n",
+        "src/shop/models.py": (
+            "from .store import save\n"
+            "class Base:\n"
+            "    def validate(self):\n"
+            "        pass\n"
+            "class Order(Base):\n"
+            "    def __init__(self):\n"
+            "        self.validate()\n"
+            "    def save(self):\n"
+            "        save(self)\n"
+        ),
+        "src/shop/store.py": "def save(item):\n    pass\n",
+        "tests/test_shop.py": (
+            "import shop.store as store\n"
+            "from shop import Order\n"
+            "def test_order():\n"
+            "    order = Order()\n"
+            "    order.save()\n"
+            "def test_store():\n"
+            "    store.save(None)\n"
+        ),
+    })
+    assert graph.callees[("tests/test_shop.py", "test_order")] == {
+        ("src/shop/models.py", "Order.__init__"), ("src/shop/models.py", "Order.save")
+    }
+    assert graph.callees[("src/shop/models.py", "Order.__init__")] == {("src/shop/models.py", "Base.validate")}
+    assert graph.callees[("src/shop/models.py", "Order.save")] == {("src/shop/store.py", "save")}
+    assert graph.callees[("tests/test_shop.py", "test_store")] == {("src/shop/store.py", "save")}
+
+    # Both tests reach store.save, only test_order reaches Base.validate
+    assert graph.find_callers([("src/shop/store.py", "save")]) >= {
+        ("tests/test_shop.py", "test_order"), ("tests/test_shop.py", "test_store")
+    }
+    tests = {node for node in graph.find_callers([("src/shop/models.py", "Base.validate")]) if node[0].startswith("tests/")}
+    assert tests == {("tests/test_shop.py", "test_order")}
+
+def test_same_method_name_is_not_matched_everywhere():
+    """Test a changed save() only affects tests calling that save(), not every .save() call."""
+    graph = make_graph({
+        "users.py": "class User:\n    def save(self):\n        pass\n",
+        "files.py": "class File:\n    def save(self):\n        pass\n",
+        "test_users.py": "from users import User\ndef test_user(user: User):\n    User().save()\n",
+        "test_files.py": (
+            "import os\n"
+            "from files import File\n"
+            "def test_file(f):\n"
+            "    f.save()\n"
+            "def test_path():\n"
+            "    os.path.join('a', 'b')\n"
+        ),
+    })
+    assert graph.find_callers([("users.py", "User.save")]) == {("test_users.py", "test_user")}
+    # A receiver of unknown type matches methods of the classes the file imports
+    assert graph.find_callers([("files.py", "File.save")]) == {("test_files.py", "test_file")}
+    assert graph.callees[("test_files.py", "test_path")] == set()
+
+def test_removed_functions_stay_targets():
+    """Test tests still calling a deleted function are found."""
+    files = {"calc.py": "def add(x, y):\n    return x + y\n", "test_calc.py": "from calc import sub\ndef test_sub():\n    sub(2, 1)\n"}
+    assert make_graph(files).find_callers([("calc.py", "sub")]) == set()
+    assert make_graph(files, [("calc.py", "sub")]).find_callers([("calc.py", "sub")]) == {("test_calc.py", "test_sub")}
+
+def test_build_repo_call_graph_reuses_parsed_files(tmp_path):
+    """Test files parsed for an earlier graph are reused and stale ones dropped."""
+    (tmp_path / "calc.py").write_text("def add(x, y):\n    return x + y\n")
+    (tmp_path / "test_calc.py").write_text("from calc import add\ndef test_add():\n    add(1, 2)\n")
+    parsed = {}
+    graph = build_repo_call_graph(WorkingTreeSource(str(tmp_path)), parsed)
+    assert graph.find_callers([("calc.py", "add")]) == {("test_calc.py", "test_add")}
+    test_symbols = graph.files["test_calc.py"]
+
+    (tmp_path / "calc.py").write_text("def add(x, y):\n    return y + x\n")
+    graph = build_repo_call_graph(WorkingTreeSource(str(tmp_path)), parsed)
+    assert graph.files["test_calc.py"] is test_symbols
+    assert len(parsed) == 2
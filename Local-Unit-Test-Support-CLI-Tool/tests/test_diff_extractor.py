@@ -1,8 +1,13 @@
-import os
+import shutil
+import subprocess
 import pytest
 from pathlib import Path
 from unittest.mock import patch, MagicMock
-from diff_extractor import GitDiffExtractor
+from diff_extractor import (
+    GitDiffExtractor, GitObjectReader, split_diff_hunks, compute_blob_sha, iter_file_diffs,
+    is_same_repository, get_mirror_path
+)
+from repo_source import GitTreeSource
 
 @pytest.fixture
 def mock_repo_path(tmp_path):
@@ -76,4 +81,160 @@ def test_cleanup(git_diff_extractor, mock_repo_path):
     """Test cleanup of repository."""
     with patch('shutil.rmtree') as mock_rmtree:
         git_diff_extractor.cleanup()
-        mock_rmtree.assert_called_once_with(mock_repo_path) 
\ No newline at end of file
+        mock_rmtree.assert_called_once_with(mock_repo_path)
+
+def test_split_diff_hunks(sample_git_diff):
+    """Test splitting a diff into hunks tagged with their file path."""
+    diff = sample_git_diff + """diff --git a/other.py b/other.py
+deleted file mode 100644
+--- a/other.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-def gone():
+---    pass
+"""
+    hunks = split_diff_hunks(diff)
+    assert len(hunks) == 2
+    assert hunks[0].startswith("test_file.py\n@@ -1,3 +1,4 @@")
+    assert "+    return None" in hunks[0]
+    assert hunks[1].startswith("other.py\n@@ -1,2 +0,0 @@")
+    assert hunks[1].endswith("---    pass")
+
+def test_git_object_reader(git_repo, commit):
+    """Test reading many blobs through one cat-file process."""
+    repo_path = git_repo
+    commit(repo_path, {"a.py": "def a():\n    pass\n", "my file.py": ""}, "first")
+    commit(repo_path, {"a.py": "def a():\n    return 1\n"}, "second")
+
+    with patch("diff_extractor.subprocess.Popen", wraps=subprocess.Popen) as mock_popen:
+        with GitObjectReader(str(repo_path)) as reader:
+            assert reader.read("HEAD^:a.py") == b"def a():\n    pass\n"
+            assert reader.read("HEAD:a.py") == b"def a():\n    return 1\n"
+            assert reader.read("HEAD:my file.py") == b""
+            assert reader.read("HEAD:missing.py") is None
+            assert reader.read("HEAD:missing file.py") is None
+            sha, object_type, _ = reader.read_object("HEAD:a.py")
+            assert (sha, object_type) == (compute_blob_sha(b"def a():\n    return 1\n"), "blob")
+    assert mock_popen.call_count == 1
+
+def test_iter_file_diffs(git_repo, git, commit):
+    """Test one diff yields every changed file with its own patch."""
+    repo_path = git_repo
+    commit(repo_path, {
+        "keep.py": "a = 1\nb = 2\n",
+        "old name.py": "x = 1\n",
+        "moved.py": "".join(f"line_{i} = {i}\n" for i in range(20)),
+    }, "first")
+    (repo_path / "old name.py").unlink()
+    git(repo_path, "mv", "moved.py", "renamed.py")
+    commit(repo_path, {"keep.py": "a = 1\nb = 3\n", "added.py": "def f():\n    pass\n"}, "second")
+
+    with patch("diff_extractor.subprocess.Popen", wraps=subprocess.Popen) as mock_popen:
+        diffs = dict(iter_file_diffs(str(repo_path), "HEAD^", "HEAD"))
+    assert mock_popen.call_count == 1
+    assert sorted(diffs) == ["added.py", "keep.py", "old name.py", "renamed.py"]
+    assert diffs["keep.py"].startswith("diff --git a/keep.py b/keep.py\n")
+    assert "-b = 2\n+b = 3\n" in diffs["keep.py"]
+    assert "deleted file mode" in diffs["old name.py"]
+    assert "rename to renamed.py" in diffs["renamed.py"]
+    assert "+def f():" in diffs["added.py"] and "keep.py" not in diffs["added.py"]
+    assert dict(iter_file_diffs(str(repo_path), "HEAD", "HEAD")) == {}
+
+def test_partial_clone(tmp_path, make_git_repo, git, commit):
+    """Test a shallow, blobless clone fetches the compared revisions and only checks out Python files."""
+    source = make_git_repo("source")
+    for i in range(4):
+        commit(source, {"module.py": f"def f():\n    return {i}\n", "data.txt": f"data {i}\n"}, f"commit {i}")
+    from_commit = git(source, "rev-parse", "HEAD~2")
+    bare = tmp_path / "bare.git"
+    subprocess.run(["git", "clone", "-q", "--bare", str(source), str(bare)], check=True)
+    git(bare, "config", "uploadpack.allowFilter", "true")
+    git(bare, "config", "uploadpack.allowAnySHA1InWant", "true")
+
+    extractor = GitDiffExtractor(f"file://{bare}", from_commit, "HEAD", clone_mode="partial", depth=1)
+    try:
+        repo_path = extractor.repo_path
+        assert (repo_path / "module.py").read_text() == "def f():\n    return 3\n"
+        assert not (repo_path / "data.txt").exists()
+        assert git(repo_path, "rev-parse", "--is-shallow-repository") == "true"
+        assert extractor.load_file_from_previous_commit("module.py", from_commit) == "def f():\n    return 1\n"
+        assert extractor.get_changed_files() == ["data.txt", "module.py"]
+
+        extractor.from_commit = "HEAD^"
+        extractor.fetch_revision("HEAD^")
+        assert git(repo_path, "rev-parse", "HEAD^") == git(source, "rev-parse", "HEAD^")
+    finally:
+        extractor.close()
+        shutil.rmtree(extractor.temp_dir)
+
+def test_local_mode(git_repo, commit):
+    """Test local mode reads an existing repository in place and never touches its working tree."""
+    repo_path = git_repo
+    for i in range(2):
+        commit(repo_path, {"module.py": f"def f():\n    return {i}\n"}, f"commit {i}")
+    (repo_path / "module.py").write_text("uncommitted\n")
+
+    extractor = GitDiffExtractor(str(repo_path), clone_mode="local")
+    try:
+        assert extractor.repo_path == repo_path.resolve()
+        assert extractor.temp_dir is None
+        assert extractor.get_changed_files() == ["module.py"]
+        assert extractor.load_file_from_previous_commit("module.py", "HEAD") == "def f():\n    return 1\n"
+    finally:
+        extractor.close()
+    assert (repo_path / "module.py").read_text() == "uncommitted\n"
+
+    with pytest.raises(RuntimeError):
+        GitDiffExtractor(str(repo_path), "HEAD~5", clone_mode="local")
+
+def test_mirror_mode(make_git_repo, git, commit):
+    """Test the cached mirror is cloned once and later runs only fetch new commits into it."""
+    source = make_git_repo("source")
+    for i in range(2):
+        commit(source, {"module.py": f"def f():\n    return {i}\n"}, f"commit {i}")
+    # A pull request ref, like the ones GitHub serves, pointing outside every branch
+    git(source, "checkout", "-q", "-b", "feature")
+    pull_commit = commit(source, {"module.py": "def f():\n    return 'pr'\n"}, "pull request")
+    git(source, "update-ref", "refs/pull/1/head", pull_commit)
+    git(source, "checkout", "-q", "-")
+    git(source, "branch", "-q", "-D", "feature")
+    git(source, "config", "uploadpack.allowAnySHA1InWant", "true")
+    repo_url = f"file://{source}"
+
+    first = GitDiffExtractor(repo_url, clone_mode="mirror")
+    first.close()
+    assert first.repo_path == get_mirror_path(repo_url)
+    assert git(first.repo_path, "rev-parse", "--is-bare-repository") == "true"
+    assert git(first.repo_path, "for-each-ref", "refs/pull") == ""
+    marker = first.repo_path / "objects" / "marker"
+    marker.write_text("kept")
+
+    commit(source, {"module.py": "def f():\n    return 2\n"}, "commit 2")
+    second = GitDiffExtractor(repo_url, clone_mode="mirror")
+    try:
+        assert second.repo_path == first.repo_path and marker.exists()
+        assert second.get_changed_files() == ["module.py"]
+        tree = GitTreeSource(str(second.repo_path), "HEAD", second.get_object_reader())
+        assert tree.read_text("module.py") == "def f():\n    return 2\n"
+    finally:
+        second.close()
+
+    # A commit outside the branches is fetched on its own when it is asked for
+    pull = GitDiffExtractor(repo_url, "HEAD", pull_commit, clone_mode="mirror")
+    try:
+        assert pull.load_file_from_previous_commit("module.py", pull_commit) == "def f():\n    return 'pr'\n"
+        assert git(pull.repo_path, "for-each-ref", "refs/pull") == ""
+    finally:
+        pull.close()
+
+    with pytest.raises(RuntimeError):
+        GitDiffExtractor(repo_url, "0" * 40, clone_mode="mirror")
+
+def test_is_same_repository():
+    """Test shallow clones, whose root commit is unknown, are matched by origin URL."""
+    full = {"root_commit": "abc", "remote": "https://example.com/repo.git"}
+    shallow = {"root_commit": None, "remote": "https://example.com/repo.git"}
+    assert is_same_repository(full, {"root_commit": "abc", "remote": None})
+    assert not is_same_repository(full, {"root_commit": "def", "remote": full["remote"]})
+    assert is_same_repository(full, shallow)
+    assert not is_same_repository(shallow, {"root_commit": None, "remote": None})
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from embedding_providers import LocalEmbeddingProvider, GeminiEmbeddingProvider, create_provider, tokenize_code
+
+def test_tokenize_code():
+    """Test identifiers are split into subwords and keywords are dropped."""
+    tokens = tokenize_code("def parseHTTPResponse(raw_body):\n    return raw_body")
+    assert "parseHTTPResponse" in tokens
+    assert {"parse", "http", "response", "raw", "body"} <= set(tokens)
+    assert "def" not in tokens and "return" not in tokens
+
+def test_local_provider_is_deterministic_and_normalized():
+    """Test local embeddings are stable, unit length and of the configured dimension."""
+    provider = LocalEmbeddingProvider(dimension=64)
+    first, empty = provider.embed(["def add(x, y):\n    return x + y", ""])
+    assert provider.embed(["def add(x, y):\n    return x + y"])[0] == first
+    assert len(first) == 64
+    assert np.linalg.norm(first) == pytest.approx(1.0, abs=1e-5)
+    assert not any(empty)
+
+def test_local_provider_ranks_shared_identifiers_closer():
+    """Test code sharing identifiers is closer than unrelated code."""
+    provider = LocalEmbeddingProvider()
+    query, related, unrelated = np.array(provider.embed([
+        "def add_numbers(x, y):\n    return x + y",
+        "def test_add_numbers():\n    assert add_numbers(1, 2) == 3",
+        "def load_config(path):\n    return json.load(open(path))",
+    ]))
+    assert np.linalg.norm(query - related) < np.linalg.norm(query - unrelated)
+
+def test_create_provider():
+    """Test providers are created by name and unknown names are rejected."""
+    assert isinstance(create_provider("local"), LocalEmbeddingProvider)
+    assert isinstance(create_provider("gemini", max_concurrency=2), GeminiEmbeddingProvider)
+    with pytest.raises(ValueError):
+        create_provider("unknown")
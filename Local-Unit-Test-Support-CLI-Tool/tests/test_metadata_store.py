@@ -0,0 +1,90 @@
+import pytest
+import sqlite3
+from metadata_store import MetadataStore
+
+@pytest.fixture
+def store(tmp_path, sample_code_blocks):
+    """Create a metadata store holding the sample code blocks under IDs 1 and 2."""
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    store.upsert(dict(zip([1, 2], sample_code_blocks.values())))
+    return store
+
+def test_lookup_by_key(store):
+    """Test looking up code blocks by (file_path, symbol_name)."""
+    assert len(store) == 2
+    assert ("test_file.py", "func1") in store
+    assert ("test_file.py", "missing") not in store
+    assert store[("test_file.py", "func2")]["code"] == "def func2():\n    return True"
+    assert store.get(("other.py", "func1")) is None
+    assert list(store) == [("test_file.py", "func1"), ("test_file.py", "func2")]
+
+def test_lookup_by_file_and_id(store):
+    """Test looking up code blocks by file and by FAISS vector ID."""
+    assert set(store.get_by_file("test_file.py")) == {("test_file.py", "func1"), ("test_file.py", "func2")}
+    assert store.get_by_file("other.py") == {}
+    blocks = store.get_by_ids([2, 3])
+    assert list(blocks) == [2]
+    assert blocks[2]["symbol_name"] == "func2"
+
+def test_delete_and_file_hashes(store):
+    """Test deleting blocks and tracking per-file blob hashes."""
+    store.delete([("test_file.py", "func1")])
+    assert list(store) == [("test_file.py", "func2")]
+
+    store.update_file_hashes({"a.py": "sha1", "b.py": "sha2"})
+    store.update_file_hashes({"a.py": "sha3"}, removed=["b.py"])
+    assert store.get_file_hashes() == {"a.py": "sha3"}
+
+    store.clear()
+    assert len(store) == 0
+    assert store.get_file_hashes() == {}
+
+def test_impacts(store):
+    """Test the reverse dependency index maps symbols to the tests reaching them."""
+    assert not store.has_impacts()
+    store.replace_impacts({
+        ("test_calc.py", "test_add"): {("calc.py", "add"), ("calc.py", "helper")},
+        ("test_calc.py", "test_sub"): {("calc.py", "sub"), ("calc.py", "helper")},
+    })
+    assert store.has_impacts()
+    assert store.get_impacted_tests([("calc.py", "helper")]) == {("test_calc.py", "test_add"), ("test_calc.py", "test_sub")}
+    assert store.get_impacted_tests([("calc.py", "add"), ("other.py", "add")]) == {("test_calc.py", "test_add")}
+    assert store.get_tests_touching(["test_calc.py"]) == {("test_calc.py", "test_add"), ("test_calc.py", "test_sub")}
+
+    store.replace_impacts({("test_calc.py", "test_add"): {("calc.py", "add")}, ("test_calc.py", "test_sub"): set()})
+    assert store.get_impacted_tests([("calc.py", "helper"), ("calc.py", "sub")]) == set()
+    assert store.get_tests_touching(["calc.py"]) == {("test_calc.py", "test_add")}
+
+def test_calls(store):
+    """Test the stored call edges are followed transitively, through cycles, to every caller."""
+    store.replace_calls({
+        ("api.py", "handle"): {("service.py", "run")},
+        ("service.py", "run"): {("calc.py", "add"), ("service.py", "retry")},
+        ("service.py", "retry"): {("service.py", "run")},
+        ("cli.py", "main"): {("calc.py", "sub")},
+    })
+    assert store.get_callers([("calc.py", "add")]) == {("service.py", "run"), ("service.py", "retry"), ("api.py", "handle")}
+    assert store.get_callers([("calc.py", "sub"), ("other.py", "add")]) == {("cli.py", "main")}
+    assert store.get_callers_touching(["calc.py", "api.py"]) == {("service.py", "run"), ("cli.py", "main"), ("api.py", "handle")}
+
+    store.replace_calls({("service.py", "run"): {("calc.py", "sub")}, ("service.py", "retry"): set()})
+    assert store.get_callers([("calc.py", "add")]) == set()
+    assert store.get_callers([("calc.py", "sub")]) == {("service.py", "run"), ("cli.py", "main"), ("api.py", "handle")}
+    store.clear()
+    assert store.get_callers([("calc.py", "sub")]) == set()
+
+def test_context_manager_closes(tmp_path, sample_code_blocks):
+    """Test the store closes its connection when used as a context manager."""
+    with MetadataStore(str(tmp_path / "metadata.db")) as store:
+        store.upsert(dict(zip([1, 2], sample_code_blocks.values())))
+    with pytest.raises(sqlite3.ProgrammingError):
+        len(store)
+    with MetadataStore(str(tmp_path / "metadata.db")) as store:
+        assert len(store) == 2
+
+def test_tests_touching_many_files(store):
+    """Test looking up tests by many files stays within SQLite's default limit of 999 parameters."""
+    store.conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    store.replace_impacts({("test_calc.py", "test_add"): {("calc.py", "add")}})
+    files = [f"mod{i}.py" for i in range(1000)] + ["calc.py"]
+    assert store.get_tests_touching(files) == {("test_calc.py", "test_add")}
@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import patch
+from repo_source import WorkingTreeSource, GitTreeSource
+from diff_extractor import compute_blob_sha
+
+@pytest.fixture
+def git_repo(git_repo, commit):
+    """Create a git repository with two commits and uncommitted edits in the working tree."""
+    commit(git_repo, {
+        "app.py": "def run():\n    return 1\n",
+        "notes.txt": "notes\n",
+        "venv/lib.py": "def vendored():\n    pass\n",
+    }, "initial")
+    commit(git_repo, {"tests/test_app.py": "def test_run():\n    run()\n"}, "add tests")
+    (git_repo / "app.py").write_text("def run():\n    return 2\n")
+    return git_repo
+
+def test_git_tree_source_reads_commit_without_checkout(git_repo, git):
+    """Test files are listed and read at a commit, ignoring the working tree."""
+    source = GitTreeSource(str(git_repo), "HEAD^")
+    assert source.commit == git(git_repo, "rev-parse", "HEAD^")
+    assert source.list_files() == ["app.py"]
+    assert source.read_text("app.py") == "def run():\n    return 1\n"
+    assert source.read_bytes("tests/test_app.py") is None
+    assert not source.exists("tests/test_app.py")
+
+    head = GitTreeSource(str(git_repo))
+    assert head.list_files() == ["app.py", "tests/test_app.py"]
+    assert head.file_hashes(["app.py"]) == {"app.py": git(git_repo, "rev-parse", "HEAD:app.py")}
+    code_blocks = head.extract_code_blocks(head.list_files())
+    assert list(code_blocks) == [("app.py", "run"), ("tests/test_app.py", "test_run")]
+    assert code_blocks[("app.py", "run")]["code"] == "def run():\n    return 1"
+
+    with pytest.raises(ValueError):
+        GitTreeSource(str(git_repo), "no-such-branch")
+
+def test_git_tree_source_skips_reading_cached_blobs(git_repo):
+    """Test blobs already in the parse cache are neither read nor parsed again."""
+    source = GitTreeSource(str(git_repo))
+    first = source.extract_code_blocks(["app.py"])
+    with patch.object(source, "read_bytes") as mock_read, patch("ast_parser.extract_symbols") as mock_extract:
+        second = source.extract_code_blocks(["app.py"])
+    mock_read.assert_not_called()
+    mock_extract.assert_not_called()
+    assert second == first
+
+def test_working_tree_source(git_repo, git):
+    """Test the working tree source sees uncommitted edits."""
+    source = WorkingTreeSource(str(git_repo))
+    assert source.commit == git(git_repo, "rev-parse", "HEAD")
+    assert sorted(source.list_files()) == ["app.py", "tests/test_app.py"]
+    assert source.read_text("app.py") == "def run():\n    return 2\n"
+    assert source.file_hashes(["app.py"]) == {"app.py": compute_blob_sha(b"def run():\n    return 2\n")}
+    assert source.read_bytes("missing.py") is None
@@ -1,77 +1,323 @@
+import os
 import ast
-from typing import List, Dict, Set
+import hashlib
+from typing import List, Dict, Set, Iterable, Iterator, Tuple, Optional
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cache import ParseCache, get_cache_dir
+from diff_extractor import compute_blob_sha
+
+# Bumped whenever the extracted symbols change, so indexes and caches built by an older parser are rebuilt
+PARSER_VERSION = 4
+# Below this many files, starting worker processes costs more than parsing serially
+PARALLEL_MIN_FILES = 64
+# Files parsed per task, so a worker round trip is not paid for every small file
+PARALLEL_CHUNK_SIZE = 16
+
+_parse_cache = None
+
+class FileSymbols:
+    """Everything the pipeline needs from one parse of a Python file.
+
+    symbols maps qualified names (e.g. "Class.method") to the symbol's type, short
+    name, source code, body hash and line range (and base classes for classes);
+    calls maps each function's qualified name to the names it calls. For resolving
+    calls across modules, call_paths keeps the dotted callee expressions instead
+    (see get_call_path), imports maps names bound by imports to what they import
+    (relative imports keep their leading dots) and star_imports lists the modules
+    imported with *. module_hash fingerprints the module-level statements outside
+    functions and classes (see structural_hash).
+    """
+
+    def __init__(self, symbols: Dict[str, Dict], calls: Dict[str, Set[str]], call_paths: Dict[str, Set[str]] = None,
+                 imports: Dict[str, str] = None, star_imports: List[str] = None, module_hash: str = None):
+        self.symbols = symbols
+        self.calls = calls
+        self.call_paths = call_paths or {}
+        self.imports = imports or {}
+        self.star_imports = star_imports or []
+        self.module_hash = module_hash
+
+    def to_dict(self) -> Dict:
+        """Return a JSON-serializable form of the parse result."""
+        return {
+            "symbols": self.symbols,
+            "calls": {name: sorted(callees) for name, callees in self.calls.items()},
+            "call_paths": {name: sorted(paths) for name, paths in self.call_paths.items()},
+            "imports": self.imports,
+            "star_imports": self.star_imports,
+            "module_hash": self.module_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FileSymbols":
+        return cls(
+            data["symbols"],
+            {name: set(callees) for name, callees in data["calls"].items()},
+            {name: set(paths) for name, paths in data.get("call_paths", {}).items()},
+            data.get("imports", {}),
+            data.get("star_imports", []),
+            data.get("module_hash"),
+        )
+
+    def functions(self) -> Dict[str, Dict]:
+        """Return the functions and methods, async ones included, keyed by qualified name."""
+        return {name: symbol for name, symbol in self.symbols.items() if symbol["symbol_type"] == "function"}
+
+    def code_blocks(self, relative_path: str) -> Dict[Tuple[str, str], Dict]:
+        """Return the functions and classes as code blocks keyed by (file_path, qualified name)."""
+        return {
+            (relative_path, name): {
+                "symbol_type": symbol["symbol_type"],
+                "symbol_name": name,
+                "file_path": relative_path,
+                "code": symbol["code"]
+            }
+            for name, symbol in self.symbols.items()
+        }
+
+    def call_graph(self) -> Dict[str, Set[str]]:
+        """Return the call graph with callees resolved to the qualified names of functions in this file.
+
+        A called name resolves to the method of the caller's own class when there is
+        one, otherwise to every function of the file with that short name, and is
+        kept as is when the file defines no such function.
+        """
+        by_short_name = defaultdict(set)
+        for name in self.calls:
+            by_short_name[name.rsplit(".", 1)[-1]].add(name)
+
+        graph = {}
+        for caller, callees in self.calls.items():
+            caller_scope = caller.rsplit(".", 1)[0] + "." if "." in caller else ""
+            resolved = set()
+            for callee in callees:
+                if caller_scope and caller_scope + callee in self.calls:
+                    resolved.add(caller_scope + callee)
+                else:
+                    resolved.update(by_short_name.get(callee) or {callee})
+            graph[caller] = resolved
+        return graph
+
+DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+def is_docstring(node: ast.stmt) -> bool:
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+def _feed_structure(node, update, members: bool = True) -> None:
+    if isinstance(node, ast.AST):
+        update(type(node).__name__.encode())
+        for field, value in ast.iter_fields(node):
+            if field == "body" and isinstance(node, DEFINITIONS + (ast.Module,)):
+                value = value[1:] if value and is_docstring(value[0]) else value
+                if not members:
+                    value = [statement for statement in value if not isinstance(statement, DEFINITIONS)]
+            elif field == "type_comment":
+                continue
+            update(f"({field}=".encode())
+            _feed_structure(value, update)
+            update(b")")
+    elif isinstance(node, list):
+        update(b"[")
+        for item in node:
+            _feed_structure(item, update)
+            update(b",")
+        update(b"]")
+    else:
+        update(repr(node).encode())
+
+def structural_hash(node: ast.AST, members: bool = True) -> str:
+    """Return a hash of a definition's syntax tree that ignores docstrings, comments and formatting.
+
+    With members=False, the functions and classes defined directly in the node's
+    body are left out: they are hashed as symbols of their own, so a class or
+    module only changes with its own statements (attributes, bases, decorators).
+    """
+    digest = hashlib.sha1()
+    _feed_structure(node, digest.update, members)
+    return digest.hexdigest()
+
+def get_call_name(node: ast.Call) -> str:
+    """Return the name a call refers to: foo() -> foo, obj.foo() -> foo, or None for other callees."""
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+def get_call_path(node: ast.expr) -> Optional[str]:
+    """Return the dotted path of a callee expression.
+
+    foo -> foo, mod.foo -> mod.foo, self.foo -> self.foo and Foo().bar -> Foo.bar.
+    Attributes of other expressions, e.g. items[0].save, get "?" as receiver: ?.save.
+    Returns None for callees without a name, such as lambdas.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = get_call_path(node.value)
+        return f"{base or '?'}.{node.attr}"
+    if isinstance(node, ast.Call):
+        return get_call_path(node.func)
+    return None
+
+def get_import_target(node: ast.ImportFrom, name: str = None) -> str:
+    """Return the dotted target of a from-import, keeping one leading dot per relative level."""
+    module = "." * node.level + (node.module or "")
+    if name is None:
+        return module
+    return f"{module}.{name}" if node.module else module + name
+
+class SymbolExtractor(ast.NodeVisitor):
+    """Collect symbols, calls and imports of a module in a single pass over its syntax tree."""
+
+    def __init__(self, source: str):
+        self.lines = source.splitlines()
+        self.scope = []
+        self.current_funcs = []
+        self.symbols = {}
+        self.calls = {}
+        self.call_paths = {}
+        self.imports = {}
+        self.star_imports = []
+        # Per function: local variables assigned an instance, e.g. calc = Calculator()
+        self.local_types = {}
+
+    def _add_symbol(self, node, symbol_type: str) -> str:
+        qualified_name = ".".join(self.scope + [node.name])
+        self.symbols[qualified_name] = {
+            "symbol_type": symbol_type,
+            "name": node.name,
+            "async": isinstance(node, ast.AsyncFunctionDef),
+            "code": "\n".join(self.lines[node.lineno - 1:node.end_lineno]),
+            "body_hash": structural_hash(node, members=symbol_type != "class"),
+            "start_line": node.lineno,
+            "end_line": node.end_lineno
+        }
+        return qualified_name
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        qualified_name = self._add_symbol(node, "class")
+        self.symbols[qualified_name]["bases"] = [path for path in map(get_call_path, node.bases) if path]
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node):
+        qualified_name = self._add_symbol(node, "function")
+        self.calls[qualified_name] = set()
+        self.call_paths[qualified_name] = set()
+        self.local_types[qualified_name] = {}
+        self.scope.append(node.name)
+        self.current_funcs.append(qualified_name)
+        self.generic_visit(node)
+        self.current_funcs.pop()
+        self.scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node: ast.Call):
+        name = get_call_name(node)
+        if self.current_funcs and name:
+            self.calls[self.current_funcs[-1]].add(name)
+            path = get_call_path(node.func)
+            if path:
+                # calc.add() on calc = Calculator() is Calculator.add()
+                head, _, rest = path.partition(".")
+                local_type = self.local_types[self.current_funcs[-1]].get(head)
+                if rest and local_type:
+                    path = f"{local_type}.{rest}"
+                self.call_paths[self.current_funcs[-1]].add(path)
+        self.generic_visit(node)
+
+    def _bind_instance(self, target: ast.expr, value: ast.expr):
+        if self.current_funcs and isinstance(target, ast.Name) and isinstance(value, ast.Call):
+            path = get_call_path(value.func)
+            if path:
+                self.local_types[self.current_funcs[-1]][target.id] = path
+
+    def visit_Assign(self, node: ast.Assign):
+        if len(node.targets) == 1:
+            self._bind_instance(node.targets[0], node.value)
+        self.generic_visit(node)
+
+    def visit_With(self, node):
+        for item in node.items:
+            if item.optional_vars is not None:
+                self._bind_instance(item.optional_vars, item.context_expr)
+        self.generic_visit(node)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            if alias.asname:
+                self.imports[alias.asname] = alias.name
+            else:
+                # import a.b binds a, and a.b.f() is looked up from there
+                head = alias.name.split(".")[0]
+                self.imports[head] = head
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_imports.append(get_import_target(node))
+            else:
+                self.imports[alias.asname or alias.name] = get_import_target(node, alias.name)
+
+def extract_symbols(code: str) -> FileSymbols:
+    """Parse Python code once and extract its symbols and call graph."""
+    extractor = SymbolExtractor(code)
+    tree = ast.parse(code)
+    extractor.visit(tree)
+    return FileSymbols(extractor.symbols, extractor.calls, extractor.call_paths, extractor.imports, extractor.star_imports,
+                       structural_hash(tree, members=False))
+
+def get_parse_cache() -> ParseCache:
+    """Return this process's parse cache for the current cache directory."""
+    global _parse_cache
+    path = get_cache_dir() / "parse.sqlite"
+    # Connections must not be shared with forked parser processes
+    if _parse_cache is None or _parse_cache.path != path or _parse_cache.pid != os.getpid():
+        _parse_cache = ParseCache(path)
+    return _parse_cache
+
+def parse_source(source: str, blob_sha: str = None, use_cache: bool = True) -> FileSymbols:
+    """Return the symbols of Python source code, parsing it only if its blob was never parsed before.
+
+    blob_sha is the git blob SHA of the source; it is computed when not given.
+    """
+    if not use_cache:
+        return extract_symbols(source)
+    if blob_sha is None:
+        blob_sha = compute_blob_sha(source.encode("utf-8"))
+    cache = get_parse_cache()
+    cached = cache.get(blob_sha, PARSER_VERSION)
+    if cached is not None:
+        return FileSymbols.from_dict(cached)
+    symbols = extract_symbols(source)
+    cache.put(blob_sha, PARSER_VERSION, symbols.to_dict())
+    return symbols
 
 def extract_functions_with_body(code: str) -> Dict[str, str]:
     """
     Extract function names and their source code body from Python code.
     """
-    tree = ast.parse(code)
-    functions = {}
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            # Use the full function body as the value
-            func_name = node.name
-            func_code = ast.unparse(node)  # Requires Python 3.9+
-            functions[func_name] = func_code
-    return functions
+    return {name: symbol["code"] for name, symbol in extract_symbols(code).functions().items()}
 
 def extract_call_graph(code: str) -> Dict[str, Set[str]]:
     """
     Extract a call graph from Python code.
     Returns a dictionary mapping function names to sets of functions they call.
     """
-    class FunctionCallCollector(ast.NodeVisitor):
-        def __init__(self):
-            self.calls = defaultdict(set)
-            self.current_func = None
-
-        def visit_FunctionDef(self, node):
-            self.current_func = node.name
-            self.generic_visit(node)
-            self.current_func = None
-
-        def visit_Call(self, node):
-            if self.current_func:
-                if isinstance(node.func, ast.Name):
-                    self.calls[self.current_func].add(node.func.id)
-                elif isinstance(node.func, ast.Attribute):
-                    self.calls[self.current_func].add(node.func.attr)
-            self.generic_visit(node)
-
-    tree = ast.parse(code)
-    collector = FunctionCallCollector()
-    collector.visit(tree)
-    return dict(collector.calls)
+    return extract_symbols(code).call_graph()
 
 def build_call_graph(code: str) -> Dict[str, Set[str]]:
     """
     Build a call graph: {caller_function: set(called_function_names)}
     """
-    call_graph = {}
-
-    class FunctionVisitor(ast.NodeVisitor):
-        def __init__(self):
-            self.current_func = None
-
-        def visit_FunctionDef(self, node: ast.FunctionDef):
-            self.current_func = node.name
-            call_graph[self.current_func] = set()
-            self.generic_visit(node)
-            self.current_func = None
-
-        def visit_Call(self, node: ast.Call):
-            if self.current_func:
-                if isinstance(node.func, ast.Name):
-                    call_graph[self.current_func].add(node.func.id)
-                elif isinstance(node.func, ast.Attribute):
-                    call_graph[self.current_func].add(node.func.attr)
-            self.generic_visit(node)
-
-    tree = ast.parse(code)
-    FunctionVisitor().visit(tree)
-    return call_graph
+    return extract_symbols(code).calls
 
 def find_callers(target_funcs: List[str], call_graph: Dict[str, Set[str]]) -> Set[str]:
     """
@@ -83,44 +329,124 @@ def find_callers(target_funcs: List[str], call_graph: Dict[str, Set[str]]) -> Se
             callers.add(caller)
     return callers
 
-def expand_calls(call_map: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+def strongly_connected_components(adjacency: List[List[int]]) -> Tuple[List[int], List[List[int]]]:
+    """Find the strongly connected components of a graph over nodes 0..n-1 (Tarjan, without recursion).
+
+    Returns the component of each node and the members of each component.
+    Components come in reverse topological order: every component is listed
+    after all components it has edges to.
+    """
+    count = len(adjacency)
+    index = [-1] * count
+    lowlink = [0] * count
+    on_stack = [False] * count
+    component = [-1] * count
+    components = []
+    stack = []
+    next_index = 0
+    for root in range(count):
+        if index[root] != -1:
+            continue
+        index[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+        while work:
+            node, edge = work[-1]
+            if edge < len(adjacency[node]):
+                work[-1] = (node, edge + 1)
+                successor = adjacency[node][edge]
+                if index[successor] == -1:
+                    index[successor] = lowlink[successor] = next_index
+                    next_index += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, 0))
+                elif on_stack[successor]:
+                    lowlink[node] = min(lowlink[node], index[successor])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = len(components)
+                    members.append(member)
+                    if member == node:
+                        break
+                components.append(members)
+    return component, components
+
+def expand_calls(call_map: Dict[str, Set[str]], functions: Iterable[str] = None) -> Dict[str, Set[str]]:
     """
     Expand the call graph to include all functions that are called transitively.
-    For each function, returns the set of all functions it calls directly or indirectly.
+    For each function (of functions when given, otherwise of call_map), returns
+    the set of all functions it calls directly or indirectly.
+
+    Functions calling each other are collapsed into one component, and the
+    reachable set of each component is computed once, without recursion, from
+    the sets of the components it calls.
     """
-    def dfs(func: str, visited: Set[str]) -> Set[str]:
-        for callee in call_map.get(func, []):
-            if callee not in visited:
-                visited.add(callee)
-                dfs(callee, visited)
-        return visited
+    names = list(call_map)
+    ids = {name: i for i, name in enumerate(names)}
+    for callees in call_map.values():
+        for callee in callees:
+            if callee not in ids:
+                ids[callee] = len(names)
+                names.append(callee)
+    adjacency = [[ids[callee] for callee in call_map.get(name, ())] for name in names]
+    component, components = strongly_connected_components(adjacency)
 
-    return {func: dfs(func, set()) for func in call_map}
+    # Components come callees first, so the sets they extend are already complete
+    reachable = []
+    for c, members in enumerate(components):
+        callees = set()
+        cyclic = False
+        for member in members:
+            for successor in adjacency[member]:
+                if component[successor] == c:
+                    cyclic = True
+                elif names[successor] not in callees:
+                    callees.add(names[successor])
+                    callees.update(reachable[component[successor]])
+        if cyclic:
+            # Every member of a cycle reaches every other, and itself
+            callees.update(names[member] for member in members)
+        reachable.append(callees)
 
-def analyze_ast_diff(before_code: str, after_code: str) -> Dict[str, List[str]]:
-    before_funcs = extract_functions_with_body(before_code)
-    after_funcs = extract_functions_with_body(after_code)
+    return {name: set(reachable[component[ids[name]]]) if name in ids else set()
+            for name in (call_map if functions is None else functions)}
 
-    before_names = set(before_funcs.keys())
-    after_names = set(after_funcs.keys())
+def analyze_ast_diff(before_code: str, after_code: str) -> Dict:
+    """Compare two versions of a module symbol by symbol, using qualified names.
 
-    added = after_names - before_names
-    removed = before_names - after_names
+    Functions (async ones included), methods and classes are compared by their
+    structural hashes, so docstring, comment and formatting changes are not
+    changes; "module" tells whether the module-level statements changed.
+    """
+    before_symbols = parse_source(before_code)
+    after_symbols = parse_source(after_code)
+    before_hashes = {name: symbol["body_hash"] for name, symbol in before_symbols.symbols.items()}
+    after_hashes = {name: symbol["body_hash"] for name, symbol in after_symbols.symbols.items()}
 
-    modified = []
-    for func_name in before_names & after_names:
-        if before_funcs[func_name] != after_funcs[func_name]:
-            modified.append(func_name)
+    added = after_hashes.keys() - before_hashes.keys()
+    removed = before_hashes.keys() - after_hashes.keys()
+    modified = [name for name in sorted(before_hashes.keys() & after_hashes.keys()) if before_hashes[name] != after_hashes[name]]
 
-    # Find indirect dependents (functions that call modified ones)
-    call_graph = build_call_graph(after_code)
-    indirect_dependents = find_callers(modified, call_graph)
+    # Find indirect dependents (functions that call modified ones), on callees resolved to qualified names
+    indirect_dependents = find_callers(modified, after_symbols.call_graph())
 
     return {
-        "added": list(added),
-        "removed": list(removed),
+        "added": sorted(added),
+        "removed": sorted(removed),
         "modified": modified,
-        "indirect_dependents": list(indirect_dependents)
+        "indirect_dependents": sorted(indirect_dependents),
+        "module": before_symbols.module_hash != after_symbols.module_hash
     }
 
 def extract_code_blocks(file_path: Path, repo_path: str):
@@ -128,24 +454,70 @@ def extract_code_blocks(file_path: Path, repo_path: str):
     repo_path = Path(repo_path)
     code_blocks = {}
     try:
-        source = file_path.read_text(encoding="utf-8")
-        tree = ast.parse(source)
+        data = file_path.read_bytes()
         relative_path = file_path.relative_to(repo_path)
-        
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                block_type = "function" if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) else "class"
-                name = node.name
-                start_line = node.lineno - 1
-                end_line = node.end_lineno
-                code_chunk = "\n".join(source.splitlines()[start_line:end_line])
-                key = (str(relative_path), name)
-                code_blocks[key] = {
-                    "symbol_type": block_type,
-                    "symbol_name": name,
-                    "file_path": str(relative_path),
-                    "code": code_chunk
-                }
+        symbols = parse_source(data.decode("utf-8"), compute_blob_sha(data))
+        code_blocks = symbols.code_blocks(str(relative_path))
     except Exception as e:
         print(f"Error processing file {file_path}: {str(e)}")
-    return code_blocks 
\ No newline at end of file
+    return code_blocks
+
+def parse_file(relative_path: str, data: bytes, blob_sha: str = None) -> Optional[FileSymbols]:
+    """Parse the content of a Python file, or return None when it cannot be parsed."""
+    try:
+        return parse_source(data.decode("utf-8"), blob_sha or compute_blob_sha(data))
+    except Exception as e:
+        print(f"Error processing file {relative_path}: {str(e)}")
+        return None
+
+def extract_source_code_blocks(relative_path: str, data: bytes, blob_sha: str = None):
+    """Extract code blocks (functions and classes) from the content of a Python file."""
+    symbols = parse_file(relative_path, data, blob_sha)
+    return symbols.code_blocks(relative_path) if symbols is not None else {}
+
+def get_cached_symbols(blob_sha: str):
+    """Return the symbols of a blob that was parsed before, or None."""
+    cached = get_parse_cache().get(blob_sha, PARSER_VERSION)
+    return FileSymbols.from_dict(cached) if cached is not None else None
+
+def _extract_chunk(extract, items: List[Tuple]) -> List[Tuple]:
+    return [(item[0], extract(*item)) for item in items]
+
+def _iter_extracted(extract, items: List[Tuple], workers: int = None) -> Iterator[Tuple]:
+    """Call extract(*item) for every item, yielding (item[0], result) as items finish.
+
+    Items are processed in a pool of worker processes (workers defaults to the CPU
+    count), or serially for small repositories and when workers is 1.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(items) < PARALLEL_MIN_FILES:
+        for item in items:
+            yield item[0], extract(*item)
+        return
+
+    chunks = [items[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(items), PARALLEL_CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [pool.submit(_extract_chunk, extract, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+def iter_code_blocks(file_paths: List[Path], repo_path: str, workers: int = None) -> Iterator[Tuple[Path, Dict]]:
+    """Extract code blocks from many files, yielding (file_path, code_blocks) as files finish."""
+    return _iter_extracted(extract_code_blocks, [(file_path, repo_path) for file_path in file_paths], workers)
+
+def iter_source_code_blocks(sources: List[Tuple[str, bytes, str]], workers: int = None) -> Iterator[Tuple[str, Dict]]:
+    """Extract code blocks from (relative_path, content, blob_sha) items, yielding (relative_path, code_blocks)."""
+    return _iter_extracted(extract_source_code_blocks, list(sources), workers)
+
+def iter_parsed_files(sources: List[Tuple[str, bytes, str]], workers: int = None) -> Iterator[Tuple[str, Optional[FileSymbols]]]:
+    """Parse (relative_path, content, blob_sha) items, yielding (relative_path, symbols or None)."""
+    return _iter_extracted(parse_file, list(sources), workers)
+
+def extract_all_code_blocks(file_paths: List[Path], repo_path: str, workers: int = None) -> Dict:
+    """Extract the code blocks of many files, merged in the order of file_paths."""
+    file_paths = list(file_paths)
+    by_file = dict(iter_code_blocks(file_paths, repo_path, workers))
+    code_blocks = {}
+    for file_path in file_paths:
+        code_blocks.update(by_file[file_path])
+    return code_blocks
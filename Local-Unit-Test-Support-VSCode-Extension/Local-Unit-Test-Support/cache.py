@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import List, Dict, Optional
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "coveriq"
+# SQLite limits the number of bound parameters per statement
+SQLITE_MAX_PARAMS = 900
+
+def get_cache_dir() -> Path:
+    """Return the directory for persistent caches (override with COVERIQ_CACHE_DIR)."""
+    return Path(os.getenv("COVERIQ_CACHE_DIR", str(DEFAULT_CACHE_DIR)))
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model name, task type, code hash)."""
+
+    def __init__(self, path: str = None):
+        if path is None:
+            path = get_cache_dir() / "embeddings.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, task_type TEXT NOT NULL, code_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, task_type, code_hash)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get_many(self, model: str, task_type: str, code_hashes: List[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors for the given code hashes that are present."""
+        found = {}
+        code_hashes = list(code_hashes)
+        with self.lock:
+            for start in range(0, len(code_hashes), SQLITE_MAX_PARAMS):
+                chunk = code_hashes[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT code_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND task_type = ? AND code_hash IN ({placeholders})",
+                    [model, task_type, *chunk],
+                )
+                for code_hash, blob in rows:
+                    found[code_hash] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, task_type: str, vectors: Dict[str, List[float]]) -> None:
+        """Store vectors keyed by code hash."""
+        rows = [(model, task_type, code_hash, array("f", vector).tobytes()) for code_hash, vector in vectors.items()]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+class ParseCache:
+    """Persistent cache of parsed Python files keyed by (git blob SHA, parser version).
+
+    Safe to share between worker processes; each process opens its own connection.
+    """
+
+    def __init__(self, path: str = None):
+        if path is None:
+            path = get_cache_dir() / "parse.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        # WAL lets parser processes read while another one writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS parsed ("
+            "blob_sha TEXT NOT NULL, parser_version INTEGER NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (blob_sha, parser_version)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get(self, blob_sha: str, parser_version: int) -> Optional[Dict]:
+        """Return the cached parse result of a blob, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM parsed WHERE blob_sha = ? AND parser_version = ?", (blob_sha, parser_version)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, blob_sha: str, parser_version: int, data: Dict) -> None:
+        """Store the parse result of a blob."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO parsed VALUES (?, ?, ?)", (blob_sha, parser_version, json.dumps(data))
+            )
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
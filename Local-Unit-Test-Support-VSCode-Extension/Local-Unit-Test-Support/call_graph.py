@@ -0,0 +1,227 @@
+"""Repository-wide symbol table and call graph.
+
+Nodes are (relative_path, qualified_name) pairs, the same keys as the code blocks
+of the index. Calls are resolved the way Python looks names up: self/cls go to
+the enclosing class (and its bases), bare names to nested or module-level
+definitions, then imports, which are followed across modules and through
+re-exports. Calling a class reaches its __init__. A method called on a value of
+unknown type, e.g. a parameter or fixture, is linked to the methods of that name
+in the classes the file defines or imports, not to every method of the
+repository. Calls into code outside the repository are dropped.
+"""
+from collections import defaultdict, deque
+from pathlib import PurePosixPath
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ast_parser import FileSymbols
+
+Node = Tuple[str, str]
+
+# Bounds on following re-exports and base classes, which can form cycles
+MAX_RESOLVE_DEPTH = 8
+
+def module_name(relative_path: str) -> str:
+    """Return the dotted module name of a file: pkg/mod.py -> pkg.mod, pkg/__init__.py -> pkg."""
+    parts = list(PurePosixPath(relative_path.replace("\\", "/")).with_suffix("").parts)
+    if parts and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+class RepoCallGraph:
+    def __init__(self, files: Dict[str, FileSymbols], removed: Iterable[Node] = ()):
+        """Build the call graph of the parsed files of one commit.
+
+        removed lists functions deleted by the change: they are kept as targets so
+        tests still calling them are found.
+        """
+        self.files = files
+        self.modules = {}
+        self.module_suffixes = defaultdict(set)
+        for path in files:
+            name = module_name(path)
+            self.modules[name] = path
+            # Tests often import src/pkg/mod.py as pkg.mod
+            parts = name.split(".")
+            for i in range(1, len(parts)):
+                self.module_suffixes[".".join(parts[i:])].add(path)
+        self.symbol_types = {path: {name: symbol["symbol_type"] for name, symbol in symbols.symbols.items()}
+                             for path, symbols in files.items()}
+        for path, name in removed:
+            self.symbol_types.setdefault(path, {}).setdefault(name, "function")
+        self._visible_classes = {}
+
+        self.callees = {}
+        for path, symbols in files.items():
+            for caller, call_paths in symbols.call_paths.items():
+                callees = set()
+                for call_path in call_paths:
+                    callees.update(self.resolve_call(path, caller, call_path))
+                self.callees[(path, caller)] = callees
+        self.callers = defaultdict(set)
+        for caller, callees in self.callees.items():
+            for callee in callees:
+                self.callers[callee].add(caller)
+
+    def find_module(self, name: str) -> Optional[str]:
+        """Return the file of a dotted module name, matching a unique suffix if not exact."""
+        if name in self.modules:
+            return self.modules[name]
+        candidates = self.module_suffixes.get(name, ())
+        return next(iter(candidates)) if len(candidates) == 1 else None
+
+    def import_target(self, path: str, name: str) -> Optional[str]:
+        """Return the absolute dotted target imported as name in the file."""
+        symbols = self.files.get(path)
+        target = symbols.imports.get(name) if symbols else None
+        return self.absolute(path, target) if target else None
+
+    def absolute(self, path: str, target: str) -> str:
+        """Resolve the leading dots of a relative import against the file's package."""
+        level = len(target) - len(target.lstrip("."))
+        if not level:
+            return target
+        package = module_name(path).split(".")
+        if not path.replace("\\", "/").endswith("__init__.py"):
+            package = package[:-1]
+        package = package[:len(package) - (level - 1)]
+        return ".".join(package + [target[level:]]).strip(".")
+
+    def resolve_absolute(self, target: str, depth: int = 0) -> Optional[Node]:
+        """Resolve a dotted name such as pkg.mod.Class.method to a node."""
+        parts = target.split(".")
+        for i in range(len(parts), 0, -1):
+            path = self.find_module(".".join(parts[:i]))
+            if path is not None:
+                return self.resolve_in_module(path, parts[i:], depth) if parts[i:] else None
+        return None
+
+    def resolve_in_module(self, path: str, parts: List[str], depth: int = 0) -> Optional[Node]:
+        types = self.symbol_types.get(path, {})
+        if parts[0] in types:
+            return self.resolve_member((path, parts[0]), parts[1:], depth)
+        # Re-exported, e.g. from an __init__.py
+        target = self.import_target(path, parts[0])
+        if target and depth < MAX_RESOLVE_DEPTH:
+            return self.resolve_absolute(".".join([target] + parts[1:]), depth + 1)
+        return None
+
+    def resolve_member(self, node: Node, parts: List[str], depth: int = 0) -> Optional[Node]:
+        """Follow attribute names from a node, looking methods up in base classes too."""
+        for part in parts:
+            node = self.find_member(node, part, depth)
+            if node is None:
+                return None
+        return node
+
+    def find_member(self, node: Node, attr: str, depth: int = 0) -> Optional[Node]:
+        path, name = node
+        types = self.symbol_types.get(path, {})
+        member = f"{name}.{attr}"
+        if member in types:
+            return path, member
+        if types.get(name) != "class" or depth >= MAX_RESOLVE_DEPTH or path not in self.files:
+            return None
+        for base in self.files[path].symbols[name].get("bases", []):
+            base_node = self.resolve_name(path, None, base, depth + 1)
+            if base_node is not None:
+                found = self.find_member(base_node, attr, depth + 1)
+                if found is not None:
+                    return found
+        return None
+
+    def enclosing_class(self, path: str, caller: str) -> Optional[str]:
+        types = self.symbol_types.get(path, {})
+        parts = caller.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            name = ".".join(parts[:i])
+            if types.get(name) == "class":
+                return name
+        return None
+
+    def scopes(self, path: str, caller: Optional[str]) -> List[str]:
+        """Return the scopes a bare name is looked up in: the caller, enclosing functions, the module."""
+        if not caller:
+            return [""]
+        types = self.symbol_types.get(path, {})
+        parts = caller.split(".")
+        enclosing = [".".join(parts[:i]) for i in range(len(parts) - 1, 0, -1)]
+        return [caller] + [name for name in enclosing if types.get(name) == "function"] + [""]
+
+    def resolve_name(self, path: str, caller: Optional[str], call_path: str, depth: int = 0) -> Optional[Node]:
+        """Resolve a dotted callee as seen from a function (or from the module when caller is None)."""
+        head, *rest = call_path.split(".")
+        types = self.symbol_types.get(path, {})
+        if head in ("self", "cls") and caller:
+            cls = self.enclosing_class(path, caller)
+            return self.resolve_member((path, cls), rest, depth) if cls and rest else None
+        for scope in self.scopes(path, caller):
+            name = f"{scope}.{head}" if scope else head
+            if name in types:
+                return self.resolve_member((path, name), rest, depth)
+        target = self.import_target(path, head)
+        if target:
+            return self.resolve_absolute(".".join([target] + rest), depth)
+        for module in self.files[path].star_imports if path in self.files else []:
+            node = self.resolve_absolute(f"{self.absolute(path, module)}.{call_path}", depth)
+            if node is not None:
+                return node
+        return None
+
+    def constructor(self, node: Node) -> Node:
+        """Calling a class runs its __init__, if it has one."""
+        path, name = node
+        types = self.symbol_types.get(path, {})
+        if types.get(name) == "class":
+            init = self.find_member(node, "__init__")
+            if init is not None:
+                return init
+        return node
+
+    def visible_classes(self, path: str) -> Set[Node]:
+        """Return the classes a file defines or imports, directly or through an imported module."""
+        if path not in self._visible_classes:
+            classes = {(path, name) for name, symbol_type in self.symbol_types.get(path, {}).items() if symbol_type == "class"}
+            symbols = self.files.get(path)
+            for name in symbols.imports if symbols else ():
+                target = self.import_target(path, name)
+                module = self.find_module(target)
+                if module is not None:
+                    classes.update((module, cls) for cls, symbol_type in self.symbol_types.get(module, {}).items() if symbol_type == "class")
+                else:
+                    node = self.resolve_absolute(target)
+                    if node is not None and self.symbol_types[node[0]].get(node[1]) == "class":
+                        classes.add(node)
+            self._visible_classes[path] = classes
+        return self._visible_classes[path]
+
+    def resolve_call(self, path: str, caller: str, call_path: str) -> Set[Node]:
+        """Return the nodes a call in caller may reach (none for calls outside the repository)."""
+        node = self.resolve_name(path, caller, call_path) if not call_path.startswith("?.") else None
+        if node is not None:
+            return {self.constructor(node)}
+        head, _, method = call_path.rpartition(".")
+        # A method on a value of unknown type; imported names that do not resolve are external
+        if not head or self.import_target(path, head.split(".")[0]):
+            return set()
+        candidates = set()
+        for class_path, cls in self.visible_classes(path):
+            member = self.find_member((class_path, cls), method)
+            if member is not None:
+                candidates.add(member)
+        return candidates
+
+    def find_callers(self, changed: Iterable[Node]) -> Set[Node]:
+        """Return every node that reaches one of the changed nodes through a chain of calls."""
+        seen = set()
+        queue = deque(changed)
+        while queue:
+            node = queue.popleft()
+            for caller in self.callers.get(node, ()):
+                if caller not in seen:
+                    seen.add(caller)
+                    queue.append(caller)
+        return seen
+
+def build_repo_call_graph(source, parsed: Dict[str, FileSymbols] = None, removed: Iterable[Node] = (), workers: int = None) -> RepoCallGraph:
+    """Parse every Python file of a source (see repo_source) and build its call graph."""
+    return RepoCallGraph(source.load_symbols(source.list_files(), parsed, workers), removed)
@@ -1,11 +1,16 @@
 import subprocess
-from typing import List
+from typing import List, Dict, Optional, Tuple, Iterator
 import os
 import tempfile
-import sys
 from pathlib import Path
 import argparse
 import shutil
+import hashlib
+import threading
+import itertools
+import re
+import shlex
+from cache import get_cache_dir
 
 def get_changed_files(repo_path: str, from_commit:str, to_commit:str) -> List[str]:
     cmd = ["git", "-C", repo_path, "diff", "--name-only", from_commit, to_commit]
@@ -18,6 +23,117 @@ def get_diff(repo_path: str, file_path: str, from_commit:str, to_commit:str) ->
     result = subprocess.run(cmd, capture_output=True, text=True)
     return result.stdout
 
+def parse_raw_records(raw: bytes) -> List[Tuple[str, str, str]]:
+    """Parse NUL-separated `git diff --raw -z` output into (status, old_path, new_path) records."""
+    fields = raw.split(b"\0")
+    records = []
+    i = 0
+    while i < len(fields) and fields[i].startswith(b":"):
+        status = fields[i].split()[-1].decode()
+        # Renames and copies carry the old and the new path, other changes one path
+        if status[0] in "RC":
+            old_path, new_path = fields[i + 1].decode(), fields[i + 2].decode()
+            i += 3
+        else:
+            old_path = new_path = fields[i + 1].decode()
+            i += 2
+        records.append((status, old_path, new_path))
+    return records
+
+def get_record_path(record: Tuple[str, str, str]) -> str:
+    """Return the path a changed file is known by: its new path, or its old path if it was deleted."""
+    status, old_path, new_path = record
+    return old_path if status == "D" else new_path
+
+def iter_file_diffs(repo_path: str, from_commit: str, to_commit: str) -> Iterator[Tuple[str, str]]:
+    """Stream (path, patch) for every changed file from a single `git diff` invocation.
+
+    Only the patch of the current file is held in memory while the output is read.
+    """
+    cmd = ["git", "-C", repo_path, "-c", "core.quotepath=false", "diff", "--raw", "-p", "-z",
+           "--no-color", "--no-ext-diff", from_commit, to_commit]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        # Raw records contain no newlines, so the first line holds all of them,
+        # an empty record, and then the header line of the first patch
+        raw, _, first_patch_line = process.stdout.readline().partition(b"\0\0")
+        records = parse_raw_records(raw)
+        headers = [f"diff --git a/{old_path} b/{new_path}\n".encode("utf-8") for _, old_path, new_path in records]
+
+        index, patch_lines = -1, []
+        for line in itertools.chain([first_patch_line] if first_patch_line else [], process.stdout):
+            # Patches come in the order of the raw records; a type change is shown as
+            # a deletion and an addition under the same header, so that continues the file
+            if line.startswith(b"diff --git ") and not (0 <= index < len(headers) and line == headers[index]):
+                if 0 <= index < len(records):
+                    yield get_record_path(records[index]), b"".join(patch_lines).decode("utf-8", errors="replace")
+                index, patch_lines = index + 1, []
+            patch_lines.append(line)
+        if 0 <= index < len(records):
+            yield get_record_path(records[index]), b"".join(patch_lines).decode("utf-8", errors="replace")
+        for record in records[index + 1:]:
+            yield get_record_path(record), ""
+
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"Error running command: {' '.join(cmd)}\nError: {stderr.decode(errors='replace')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.stderr.close()
+        process.wait()
+
+def get_head_commit(repo_path: str, rev: str = "HEAD") -> Optional[str]:
+    """Resolve a revision to a commit SHA, or return None if it cannot be resolved."""
+    cmd = ["git", "-C", repo_path, "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+def list_commits(repo_path: str, from_commit: str, to_commit: str) -> List[str]:
+    """Return the commits of from_commit..to_commit, oldest first, following first parents.
+
+    Merged branches are not walked into: each merge commit stands for the
+    changes it brings to the first-parent history.
+    """
+    cmd = ["git", "-C", repo_path, "rev-list", "--reverse", "--first-parent", f"{from_commit}..{to_commit}"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Error listing commits {from_commit}..{to_commit}: {result.stderr.strip()}")
+    return result.stdout.split()
+
+def is_shallow_repository(repo_path: str) -> bool:
+    """Return True if a repository is a shallow clone with truncated history."""
+    cmd = ["git", "-C", repo_path, "rev-parse", "--is-shallow-repository"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return result.stdout.strip() == "true"
+
+def get_repo_identity(repo_path: str) -> Optional[Dict[str, str]]:
+    """Identify a repository by its root commit (stable across clones) and origin URL.
+
+    The root commit of a shallow clone is unknown, so it is None there.
+    """
+    cmd = ["git", "-C", repo_path, "rev-list", "--max-parents=0", "HEAD"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or not result.stdout.strip():
+        return None
+    root_commit = None if is_shallow_repository(repo_path) else sorted(result.stdout.split())[0]
+    cmd = ["git", "-C", repo_path, "config", "--get", "remote.origin.url"]
+    remote = subprocess.run(cmd, capture_output=True, text=True).stdout.strip()
+    return {"root_commit": root_commit, "remote": remote or None}
+
+def is_same_repository(identity: Dict[str, str], other: Dict[str, str]) -> bool:
+    """Compare repository identities by root commit, or by origin URL when a root commit is unknown."""
+    if identity.get("root_commit") and other.get("root_commit"):
+        return identity["root_commit"] == other["root_commit"]
+    return bool(identity.get("remote")) and identity.get("remote") == other.get("remote")
+
+def compute_blob_sha(data: bytes) -> str:
+    """Return the git blob SHA of file content, as `git hash-object` would."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
 def load_file(repo_path, file_path):
     with open(os.path.join(repo_path, file_path)) as f:
         return f.read()
@@ -30,11 +146,129 @@ def load_file_from_previous_commit(repo_path: str, file_path: str, from_commit:s
         return ""
     return result.stdout
 
+def split_diff_hunks(diff: str) -> List[str]:
+    """Split unified diff text into hunks, each prefixed with the path of its file."""
+    hunks = []
+    current_file, current = None, None
+    for line in diff.splitlines():
+        if line.startswith("diff --git"):
+            if current:
+                hunks.append("\n".join(current))
+            current = None
+        elif current is None and (line.startswith("+++ ") or line.startswith("--- ")):
+            path = line[4:]
+            if path != "/dev/null":
+                current_file = path[2:] if path[:2] in ("a/", "b/") else path
+        elif line.startswith("@@"):
+            if current:
+                hunks.append("\n".join(current))
+            current = [current_file or "", line]
+        elif current is not None:
+            current.append(line)
+    if current:
+        hunks.append("\n".join(current))
+    return hunks
+
+class GitObjectReader:
+    """Reads git objects by name (e.g. `<commit>:<path>`) through one long-running `git cat-file --batch`.
+
+    Reading many files costs one git process instead of one per file.
+    """
+
+    def __init__(self, repo_path: str):
+        self.repo_path = str(repo_path)
+        self.process = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            ["git", "-C", self.repo_path, "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+
+    def read_object(self, name: str) -> Optional[Tuple[str, str, bytes]]:
+        """Return (sha, type, content) of an object, or None if it does not exist."""
+        if "\n" in name:
+            return None
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+            self.process.stdin.write(name.encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+            header = self.process.stdout.readline()
+            if not header:
+                self.process = None
+                raise RuntimeError(f"git cat-file exited while reading {name}")
+            if header.rstrip(b"\n").endswith((b" missing", b" ambiguous")):
+                return None
+            sha, object_type, size = header.split()
+            content = self.process.stdout.read(int(size))
+            # Each object is followed by a newline
+            self.process.stdout.read(1)
+        return sha.decode(), object_type.decode(), content
+
+    def read(self, name: str) -> Optional[bytes]:
+        """Return the content of an object, or None if it does not exist."""
+        result = self.read_object(name)
+        return result[2] if result else None
+
+    def close(self):
+        with self.lock:
+            if self.process is not None:
+                self.process.stdin.close()
+                self.process.wait()
+                self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+CLONE_MODES = ["full", "partial", "local", "mirror"]
+# Cached mirrors only track branches and tags: GitHub also serves a ref for
+# every pull request, which would make each fetch download all of them
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+FULL_SHA_PATTERN = re.compile(r"[0-9a-f]{40}|[0-9a-f]{64}")
+
+def get_repo_name(repo_url: str) -> str:
+    return repo_url.rstrip('/').split('/')[-1].replace('.git', '')
+
+def get_mirror_path(repo_url: str) -> Path:
+    """Return where the bare mirror of a repository is cached, keyed by a hash of its URL."""
+    url_hash = hashlib.sha256(repo_url.rstrip('/').encode("utf-8")).hexdigest()[:16]
+    return get_cache_dir() / "mirrors" / f"{get_repo_name(repo_url)}-{url_hash}.git"
+
 class GitDiffExtractor:
-    def __init__(self, repo_url, from_commit="HEAD^", to_commit="HEAD", keep_repo=False):
+    def __init__(self, repo_url, from_commit="HEAD^", to_commit="HEAD", keep_repo=False, clone_mode="full", depth=None):
+        if clone_mode not in CLONE_MODES:
+            raise ValueError(f"Unknown clone mode: {clone_mode} (expected one of {', '.join(CLONE_MODES)})")
         self.from_commit = from_commit
         self.to_commit = to_commit
         self.keep_repo = keep_repo
+        self.clone_mode = clone_mode
+        self.depth = depth
+        self.object_reader = None
+        self.file_diffs = None
+
+        if clone_mode == "local":
+            # Read an existing repository in place: nothing is cloned or checked out
+            self.temp_dir = None
+            self.repo_path = Path(repo_url).resolve()
+            self.repo_name = self.repo_path.name
+            if get_head_commit(str(self.repo_path)) is None:
+                raise RuntimeError(f"Not a git repository: {self.repo_path}")
+            for rev in (from_commit, to_commit):
+                if get_head_commit(str(self.repo_path), rev) is None:
+                    raise RuntimeError(f"Revision {rev} not found in {self.repo_name}")
+            return
+        if clone_mode == "mirror":
+            # A bare mirror kept in the cache directory across runs
+            self.temp_dir = None
+            self.repo_path = get_mirror_path(repo_url)
+            self.repo_name = get_repo_name(repo_url)
+            self.update_mirror(repo_url)
+            return
         
         # Create temp directory
         if keep_repo:
@@ -48,12 +282,15 @@ class GitDiffExtractor:
         os.makedirs(temp_dir, exist_ok=True)
 
         self.temp_dir = temp_dir
-        self.repo_name = repo_url.rstrip('/').split('/')[-1].replace('.git', '')
+        self.repo_name = get_repo_name(repo_url)
         self.repo_path = temp_dir / self.repo_name
 
         print(f"Cloning {repo_url} into {self.repo_path}")
         try:
-            self.run_command(f"git clone {repo_url}", cwd=str(self.temp_dir))
+            if clone_mode == "partial":
+                self.partial_clone(repo_url)
+            else:
+                self.run_command(f"git clone {repo_url}", cwd=str(self.temp_dir))
             if not self.repo_path.exists():
                 raise RuntimeError(f"Repository was not cloned successfully to {self.repo_path}")
             print(f"Successfully cloned repository to {self.repo_path}")
@@ -63,6 +300,76 @@ class GitDiffExtractor:
                 shutil.rmtree(self.temp_dir)
             raise
         
+    def partial_clone(self, repo_url):
+        """Clone only the history needed to compare from_commit and to_commit.
+
+        Commits and trees are fetched without blobs (and up to depth commits deep),
+        missing revisions are fetched on their own, and only the Python files of
+        to_commit are checked out. Other blobs are fetched when git first reads them.
+        """
+        depth_arg = f" --depth={int(self.depth)}" if self.depth else ""
+        self.run_command(
+            f"git clone --filter=blob:none --no-checkout{depth_arg} {shlex.quote(repo_url)} {shlex.quote(self.repo_name)}",
+            cwd=str(self.temp_dir)
+        )
+        for rev in (self.from_commit, self.to_commit):
+            self.fetch_revision(rev)
+        self.run_command("git sparse-checkout set --no-cone '*.py'", cwd=str(self.repo_path))
+        self.run_command(f"git checkout -q --detach {shlex.quote(self.to_commit)}", cwd=str(self.repo_path))
+
+    def update_mirror(self, repo_url):
+        """Create the cached mirror of the repository, or fetch only the new commits into it.
+
+        The mirror is a bare clone of the branches and tags; from_commit and
+        to_commit are fetched on their own when no branch contains them. A new
+        mirror is cloned next to its final path and moved into place, so an
+        interrupted clone never leaves a broken mirror behind.
+        """
+        refspecs = " ".join(shlex.quote(refspec) for refspec in MIRROR_REFSPECS)
+        if (self.repo_path / "HEAD").exists():
+            print(f"Fetching new commits into {self.repo_path}")
+            self.run_command(f"git fetch -q --prune origin {refspecs}", cwd=str(self.repo_path))
+        else:
+            print(f"Mirroring {repo_url} into {self.repo_path}")
+            self.repo_path.parent.mkdir(parents=True, exist_ok=True)
+            staging_path = self.repo_path.with_name(f"{self.repo_path.name}.{os.getpid()}.tmp")
+            try:
+                self.run_command(
+                    f"git clone -q --bare {shlex.quote(repo_url)} {shlex.quote(str(staging_path))}",
+                    cwd=str(self.repo_path.parent)
+                )
+                for refspec in MIRROR_REFSPECS:
+                    self.run_command(f"git config --add remote.origin.fetch {shlex.quote(refspec)}", cwd=str(staging_path))
+                try:
+                    os.rename(staging_path, self.repo_path)
+                except OSError:
+                    # Another run created the mirror first
+                    if not (self.repo_path / "HEAD").exists():
+                        raise
+            finally:
+                if staging_path.exists():
+                    shutil.rmtree(staging_path)
+        for rev in (self.from_commit, self.to_commit):
+            self.fetch_revision(rev)
+
+    def fetch_revision(self, rev):
+        """Make sure a revision is present in a partial clone or mirror, fetching as little as possible."""
+        repo_path = str(self.repo_path)
+        if get_head_commit(repo_path, rev):
+            return
+        filter_arg = " --filter=blob:none" if self.clone_mode == "partial" else ""
+        if FULL_SHA_PATTERN.fullmatch(rev):
+            # A commit outside the cloned history, e.g. of another branch
+            depth_arg = " --depth=1" if is_shallow_repository(repo_path) else ""
+            self.run_command(f"git fetch -q{filter_arg}{depth_arg} origin {rev}", cwd=repo_path)
+        elif is_shallow_repository(repo_path):
+            # A relative revision like HEAD~3 that lies beyond the cloned depth
+            self.run_command(f"git fetch -q --filter=blob:none --deepen={int(self.depth or 1)} origin", cwd=repo_path)
+            if not get_head_commit(repo_path, rev):
+                self.run_command("git fetch -q --filter=blob:none --unshallow origin", cwd=repo_path)
+        if not get_head_commit(repo_path, rev):
+            raise RuntimeError(f"Revision {rev} not found in {self.repo_name}")
+
     def run_command(self, cmd, cwd=None):
         try:
             result = subprocess.run(cmd, shell=True, text=True, capture_output=True, cwd=cwd)
@@ -75,10 +382,26 @@ class GitDiffExtractor:
             print(f"Subprocess error: {str(e)}")
             raise
     
-    def get_changed_files(self):
+    def set_commits(self, from_commit, to_commit):
+        """Compare another pair of commits, dropping the patches loaded for the previous pair."""
+        self.from_commit = from_commit
+        self.to_commit = to_commit
+        self.file_diffs = None
+
+    def load_diffs(self) -> Dict[str, str]:
+        """Return the patch of every file changed between from_commit and to_commit, read with one git diff."""
+        if not self.repo_path.exists():
+            raise RuntimeError(f"Repository path does not exist: {self.repo_path}")
+        if self.file_diffs is None:
+            self.file_diffs = dict(iter_file_diffs(str(self.repo_path), self.from_commit, self.to_commit))
+        return self.file_diffs
+
+    def get_changed_files(self, from_commit=None, to_commit=None):
         if not self.repo_path.exists():
             raise RuntimeError(f"Repository path does not exist: {self.repo_path}")
-        return get_changed_files(str(self.repo_path), self.from_commit, self.to_commit)
+        if (from_commit or self.from_commit, to_commit or self.to_commit) == (self.from_commit, self.to_commit):
+            return list(self.load_diffs())
+        return get_changed_files(str(self.repo_path), from_commit or self.from_commit, to_commit or self.to_commit)
 
     def load_file(self, file_path):
         full_path = self.repo_path / file_path
@@ -86,15 +409,29 @@ class GitDiffExtractor:
             raise FileNotFoundError(f"File not found: {full_path}")
         return load_file(str(self.repo_path), file_path)
     
+    def get_object_reader(self) -> GitObjectReader:
+        """Return the extractor's persistent object reader, starting it on first use."""
+        if self.object_reader is None:
+            self.object_reader = GitObjectReader(self.repo_path)
+        return self.object_reader
+
     def load_file_from_previous_commit(self, file_path, commit):
         if not self.repo_path.exists():
             raise RuntimeError(f"Repository path does not exist: {self.repo_path}")
-        return load_file_from_previous_commit(str(self.repo_path), file_path, commit)
+        content = self.get_object_reader().read(f"{commit}:{file_path}")
+        if content is None:
+            print(f"Warning: Could not load previous version of {file_path}")
+            return ""
+        return content.decode("utf-8", errors="replace")
     
     def get_diff(self, file_path):
-        if not self.repo_path.exists():
-            raise RuntimeError(f"Repository path does not exist: {self.repo_path}")
-        return get_diff(str(self.repo_path), file_path, self.from_commit, self.to_commit)
+        return self.load_diffs().get(file_path, "")
+
+    def close(self):
+        """Stop the background git process, if one was started."""
+        if self.object_reader is not None:
+            self.object_reader.close()
+            self.object_reader = None
 
   
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import os
+import re
+import math
+import hashlib
+import keyword
+from collections import Counter
+from typing import List, Dict
+from embedding_executor import EmbeddingExecutor, DEFAULT_CONCURRENCY
+
+EMBEDDING_MODEL = "text-embedding-004"
+EMBEDDING_TASK_TYPE = "RETRIEVAL_QUERY"
+# Per-request limits of the embedding endpoint: at most 100 contents per call,
+# and we keep the total payload bounded so large classes don't blow up a request.
+MAX_BATCH_SIZE = 100
+MAX_BATCH_CHARS = 400_000
+LOCAL_EMBEDDING_DIMENSION = 512
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Splits camelCase and digits out of identifier parts: parseHTTPResponse2 -> parse, HTTP, Response, 2
+SUBWORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+_client = None
+
+def get_client():
+    """Return the shared Gemini client, creating it on first use."""
+    global _client
+    if _client is None:
+        # Imported on first use: google.genai alone takes most of a second to import
+        from dotenv import load_dotenv
+        from google import genai
+        load_dotenv()
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        _client = genai.Client(api_key=api_key)
+    return _client
+
+def make_batches(texts: List[str], max_batch_size: int = MAX_BATCH_SIZE, max_batch_chars: int = MAX_BATCH_CHARS) -> List[List[int]]:
+    """Group text indices into batches that respect the per-request limits."""
+    batches = []
+    current, current_chars = [], 0
+    for i, text in enumerate(texts):
+        if current and (len(current) >= max_batch_size or current_chars + len(text) > max_batch_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+class EmbeddingProvider:
+    """Turns texts into vectors.
+
+    model and task_type identify the vectors in the embedding cache and the index
+    manifest, so vectors of different providers are never mixed.
+    """
+
+    name = None
+    model = None
+    task_type = ""
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returned in input order."""
+        raise NotImplementedError
+
+    def describe(self) -> Dict:
+        """Describe the provider for the index manifest."""
+        return {"provider": self.name, "model": self.model, "task_type": self.task_type}
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the Gemini API, sent in concurrent batches within the rate limits."""
+
+    name = "gemini"
+    model = EMBEDDING_MODEL
+    task_type = EMBEDDING_TASK_TYPE
+
+    def __init__(self, max_concurrency: int = DEFAULT_CONCURRENCY, rpm: int = None, tpm: int = None):
+        self.executor = EmbeddingExecutor(self.embed_batch, max_concurrency=max_concurrency, rpm=rpm, tpm=tpm)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch of texts with a single Gemini API call."""
+        from google.genai.types import EmbedContentConfig
+        response = get_client().models.embed_content(
+            model=self.model,
+            contents=texts,
+            config=EmbedContentConfig(
+                task_type=self.task_type,
+            ),
+        )
+        if len(response.embeddings) != len(texts):
+            raise RuntimeError(f"Expected {len(texts)} embeddings, got {len(response.embeddings)}")
+        return [embedding.values for embedding in response.embeddings]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = [None] * len(texts)
+        batches = make_batches(texts)
+        results = self.executor.map([[texts[i] for i in batch] for batch in batches])
+        for batch, vectors in zip(batches, results):
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+        return embeddings
+
+def tokenize_code(code: str) -> List[str]:
+    """Return the identifiers of a code snippet and their lowercased subwords, without Python keywords."""
+    tokens = []
+    for identifier in IDENTIFIER_PATTERN.findall(code):
+        if keyword.iskeyword(identifier):
+            continue
+        tokens.append(identifier)
+        parts = [part.lower() for part in SUBWORD_PATTERN.findall(identifier)]
+        if len(parts) > 1 or (parts and parts[0] != identifier):
+            tokens.extend(parts)
+    return tokens
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """Offline embeddings: a hashed bag of identifiers computed with NumPy.
+
+    Each identifier and subword is hashed to a signed bucket, counts are
+    log-scaled and vectors are L2-normalized, so L2 search ranks by cosine
+    similarity of the identifiers two snippets share.
+    """
+
+    name = "local"
+    task_type = "HASHED_IDENTIFIERS"
+
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self.model = f"hashed-identifiers-{dimension}"
+
+    def _bucket(self, token: str):
+        digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+        return digest % self.dimension, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+        vectors = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for token, count in Counter(tokenize_code(text)).items():
+                bucket, sign = self._bucket(token)
+                vectors[row, bucket] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+        return vectors.tolist()
+
+PROVIDERS = {
+    GeminiEmbeddingProvider.name: GeminiEmbeddingProvider,
+    LocalEmbeddingProvider.name: LocalEmbeddingProvider,
+}
+
+def create_provider(name: str = "gemini", max_concurrency: int = DEFAULT_CONCURRENCY,
+                    rpm: int = None, tpm: int = None) -> EmbeddingProvider:
+    """Create an embedding provider by name; the rate limits only apply to remote providers."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {name} (expected one of {', '.join(PROVIDERS)})")
+    if name == GeminiEmbeddingProvider.name:
+        return GeminiEmbeddingProvider(max_concurrency, rpm, tpm)
+    return PROVIDERS[name]()
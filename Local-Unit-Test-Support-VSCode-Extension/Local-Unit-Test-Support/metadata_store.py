@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_MAX_PARAMS = 900
+
+class MetadataStore(Mapping):
+    """Code block metadata in a single SQLite file.
+
+    Behaves as a read-only mapping from (file_path, symbol_name) to the code block,
+    and maps FAISS vector IDs to symbols. Lookups by key, by file and by vector ID
+    are indexed, so opening the store does not depend on the size of the repository.
+    It also keeps the reverse dependency index: the test functions that reach
+    each symbol through a chain of calls, and the source functions calling each symbol.
+    """
+
+    def __init__(self, path: str = "metadata.db"):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS symbols ("
+            "id INTEGER PRIMARY KEY, file_path TEXT NOT NULL, symbol_name TEXT NOT NULL, "
+            "symbol_type TEXT NOT NULL, code TEXT NOT NULL, UNIQUE (file_path, symbol_name));"
+            "CREATE TABLE IF NOT EXISTS files (file_path TEXT PRIMARY KEY, blob_sha TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS impacts ("
+            "symbol_file TEXT NOT NULL, symbol_name TEXT NOT NULL, test_file TEXT NOT NULL, test_name TEXT NOT NULL, "
+            "PRIMARY KEY (symbol_file, symbol_name, test_file, test_name));"
+            "CREATE INDEX IF NOT EXISTS impacts_by_test ON impacts (test_file, test_name);"
+            "CREATE TABLE IF NOT EXISTS calls ("
+            "callee_file TEXT NOT NULL, callee_name TEXT NOT NULL, caller_file TEXT NOT NULL, caller_name TEXT NOT NULL, "
+            "PRIMARY KEY (callee_file, callee_name, caller_file, caller_name));"
+            "CREATE INDEX IF NOT EXISTS calls_by_caller ON calls (caller_file, caller_name);"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _to_block(row) -> Dict:
+        file_path, symbol_name, symbol_type, code = row
+        return {
+            "symbol_type": symbol_type,
+            "symbol_name": symbol_name,
+            "file_path": file_path,
+            "code": code
+        }
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[Tuple]:
+        with self.lock:
+            return self.conn.execute(sql, list(params)).fetchall()
+
+    def __getitem__(self, key: Tuple[str, str]) -> Dict:
+        rows = self._query(
+            "SELECT file_path, symbol_name, symbol_type, code FROM symbols WHERE file_path = ? AND symbol_name = ?", key
+        )
+        if not rows:
+            raise KeyError(key)
+        return self._to_block(rows[0])
+
+    def __contains__(self, key) -> bool:
+        if not isinstance(key, tuple) or len(key) != 2:
+            return False
+        return bool(self._query("SELECT 1 FROM symbols WHERE file_path = ? AND symbol_name = ?", key))
+
+    def __iter__(self):
+        return iter(self._query("SELECT file_path, symbol_name FROM symbols ORDER BY file_path, symbol_name"))
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM symbols")[0][0]
+
+    def get_by_file(self, file_path: str) -> Dict[Tuple[str, str], Dict]:
+        """Return all code blocks of a file, keyed by (file_path, symbol_name)."""
+        rows = self._query("SELECT file_path, symbol_name, symbol_type, code FROM symbols WHERE file_path = ?", [file_path])
+        return {(row[0], row[1]): self._to_block(row) for row in rows}
+
+    def get_by_ids(self, vector_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Return the code blocks stored under the given FAISS vector IDs."""
+        vector_ids = list(vector_ids)
+        blocks = {}
+        for start in range(0, len(vector_ids), SQLITE_MAX_PARAMS):
+            chunk = vector_ids[start:start + SQLITE_MAX_PARAMS]
+            rows = self._query(
+                f"SELECT id, file_path, symbol_name, symbol_type, code FROM symbols "
+                f"WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in rows:
+                blocks[row[0]] = self._to_block(row[1:])
+        return blocks
+
+    def upsert(self, blocks: Dict[int, Dict]) -> None:
+        """Insert or replace code blocks keyed by FAISS vector ID."""
+        rows = [
+            (vector_id, block["file_path"], block["symbol_name"], block["symbol_type"], block["code"])
+            for vector_id, block in blocks.items()
+        ]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO symbols VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def delete(self, keys: Iterable[Tuple[str, str]]) -> None:
+        """Delete code blocks by (file_path, symbol_name)."""
+        with self.lock:
+            self.conn.executemany("DELETE FROM symbols WHERE file_path = ? AND symbol_name = ?", list(keys))
+            self.conn.commit()
+
+    def clear(self) -> None:
+        """Delete all code blocks, file hashes, impacts and calls."""
+        with self.lock:
+            self.conn.executescript("DELETE FROM symbols; DELETE FROM files; DELETE FROM impacts; DELETE FROM calls;")
+            self.conn.commit()
+
+    def get_file_hashes(self) -> Dict[str, str]:
+        """Return the git blob SHA of every indexed file."""
+        return dict(self._query("SELECT file_path, blob_sha FROM files"))
+
+    def update_file_hashes(self, file_hashes: Dict[str, str], removed: Iterable[str] = ()) -> None:
+        """Record the blob SHA of indexed files and forget removed ones."""
+        with self.lock:
+            self.conn.executemany("DELETE FROM files WHERE file_path = ?", [(file,) for file in removed])
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?)", list(file_hashes.items()))
+            self.conn.commit()
+
+    def has_impacts(self) -> bool:
+        """Return True if the reverse dependency index holds any test."""
+        return bool(self._query("SELECT 1 FROM impacts LIMIT 1"))
+
+    def get_impacted_tests(self, symbols: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """Return the (test_file, test_name) of the test functions reaching any of the symbols."""
+        tests = set()
+        for symbol in set(symbols):
+            tests.update(self._query(
+                "SELECT test_file, test_name FROM impacts WHERE symbol_file = ? AND symbol_name = ?", symbol
+            ))
+        return tests
+
+    def get_tests_touching(self, files: Iterable[str]) -> Set[Tuple[str, str]]:
+        """Return the indexed test functions defined in, or reaching a symbol of, any of the files."""
+        files = list(files)
+        tests = set()
+        # Each chunk is bound twice, once per IN clause
+        step = SQLITE_MAX_PARAMS // 2
+        for start in range(0, len(files), step):
+            chunk = files[start:start + step]
+            placeholders = ",".join("?" * len(chunk))
+            tests.update(self._query(
+                f"SELECT DISTINCT test_file, test_name FROM impacts "
+                f"WHERE symbol_file IN ({placeholders}) OR test_file IN ({placeholders})",
+                chunk + chunk,
+            ))
+        return tests
+
+    def replace_impacts(self, reached: Dict[Tuple[str, str], Iterable[Tuple[str, str]]]) -> None:
+        """Replace the symbols each given test function reaches; an empty set forgets the test."""
+        with self.lock:
+            self.conn.executemany("DELETE FROM impacts WHERE test_file = ? AND test_name = ?", list(reached))
+            self.conn.executemany("INSERT OR IGNORE INTO impacts VALUES (?, ?, ?, ?)", [
+                (*symbol, *test) for test, symbols in reached.items() for symbol in symbols
+            ])
+            self.conn.commit()
+
+    def get_callers(self, symbols: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """Return the (file_path, symbol_name) of the source functions reaching any of the symbols through a chain of calls."""
+        symbols = list(set(symbols))
+        callers = set()
+        # Two parameters per symbol
+        step = SQLITE_MAX_PARAMS // 2
+        for start in range(0, len(symbols), step):
+            chunk = symbols[start:start + step]
+            placeholders = ",".join(["(?, ?)"] * len(chunk))
+            callers.update(self._query(
+                f"WITH RECURSIVE reached (file_path, symbol_name) AS ("
+                f"SELECT caller_file, caller_name FROM calls WHERE (callee_file, callee_name) IN (VALUES {placeholders}) "
+                f"UNION SELECT caller_file, caller_name FROM calls "
+                f"JOIN reached ON callee_file = reached.file_path AND callee_name = reached.symbol_name"
+                f") SELECT file_path, symbol_name FROM reached",
+                [value for symbol in chunk for value in symbol],
+            ))
+        return callers
+
+    def get_callers_touching(self, files: Iterable[str]) -> Set[Tuple[str, str]]:
+        """Return the source functions defined in, or calling a symbol of, any of the files."""
+        files = list(files)
+        callers = set()
+        # Each chunk is bound twice, once per IN clause
+        step = SQLITE_MAX_PARAMS // 2
+        for start in range(0, len(files), step):
+            chunk = files[start:start + step]
+            placeholders = ",".join("?" * len(chunk))
+            callers.update(self._query(
+                f"SELECT DISTINCT caller_file, caller_name FROM calls "
+                f"WHERE callee_file IN ({placeholders}) OR caller_file IN ({placeholders})",
+                chunk + chunk,
+            ))
+        return callers
+
+    def replace_calls(self, callees: Dict[Tuple[str, str], Iterable[Tuple[str, str]]]) -> None:
+        """Replace the symbols each given source function calls; an empty set forgets the function."""
+        with self.lock:
+            self.conn.executemany("DELETE FROM calls WHERE caller_file = ? AND caller_name = ?", list(callees))
+            self.conn.executemany("INSERT OR IGNORE INTO calls VALUES (?, ?, ?, ?)", [
+                (*callee, *caller) for caller, symbols in callees.items() for callee in symbols
+            ])
+            self.conn.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
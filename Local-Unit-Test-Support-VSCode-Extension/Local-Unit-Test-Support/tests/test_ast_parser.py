@@ -1,11 +1,17 @@
 import pytest
-from pathlib import Path
+from unittest.mock import patch
 from ast_parser import (
     extract_functions_with_body,
     build_call_graph,
     find_callers,
+    expand_calls,
     analyze_ast_diff,
-    extract_code_blocks
+    extract_code_blocks,
+    extract_all_code_blocks,
+    iter_code_blocks,
+    extract_symbols,
+    parse_source,
+    FileSymbols
 )
 
 def test_extract_functions_with_body():
@@ -113,4 +119,180 @@ def func1():
     
     code_blocks = extract_code_blocks(test_file, str(tmp_path))
     assert len(code_blocks) == 1
-    assert "func1" in next(iter(code_blocks.values()))["code"] 
\ No newline at end of file
+    assert "func1" in next(iter(code_blocks.values()))["code"] 
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_extract_all_code_blocks(tmp_path, monkeypatch, workers):
+    """Test serial and process-pool extraction give the same blocks in file order."""
+    monkeypatch.setattr("ast_parser.PARALLEL_MIN_FILES", 2)
+    monkeypatch.setattr("ast_parser.PARALLEL_CHUNK_SIZE", 3)
+    files = []
+    for i in range(10):
+        file_path = tmp_path / f"module_{i}.py"
+        file_path.write_text(f"def func_{i}():\n    return {i}\n")
+        files.append(file_path)
+
+    code_blocks = extract_all_code_blocks(files, str(tmp_path), workers=workers)
+    assert list(code_blocks) == [(f"module_{i}.py", f"func_{i}") for i in range(10)]
+    assert code_blocks[("module_3.py", "func_3")]["code"] == "def func_3():\n    return 3"
+    assert sorted(file for file, _ in iter_code_blocks(files, str(tmp_path), workers=workers)) == sorted(files)
+
+def test_extract_symbols():
+    """Test one parse yields qualified names, code, line ranges and calls."""
+    code = """class Calculator:
+    def add(self, x, y):
+        return self.check(x) + y
+
+    def check(self, x):
+        return x
+
+def outer():
+    def inner():
+        helper()
+    inner()
+    Calculator().add(1, 2)
+"""
+    symbols = extract_symbols(code)
+    assert set(symbols.symbols) == {"Calculator", "Calculator.add", "Calculator.check", "outer", "outer.inner"}
+    add = symbols.symbols["Calculator.add"]
+    assert add["symbol_type"] == "function"
+    assert add["code"] == "    def add(self, x, y):\n        return self.check(x) + y"
+    assert (add["start_line"], add["end_line"]) == (2, 3)
+    assert symbols.calls["outer.inner"] == {"helper"}
+    assert symbols.calls["outer"] == {"inner", "Calculator", "add"}
+
+    call_graph = symbols.call_graph()
+    assert call_graph["Calculator.add"] == {"Calculator.check"}
+    assert call_graph["outer"] == {"outer.inner", "Calculator", "Calculator.add"}
+
+def test_extract_symbols_body_hash_ignores_formatting():
+    """Test body hashes only change when the code does."""
+    before = extract_symbols("def f(x):\n    # comment\n    return x+1\n").symbols["f"]["body_hash"]
+    assert extract_symbols("def f(x):\n    return x + 1\n").symbols["f"]["body_hash"] == before
+    assert extract_symbols("def f(x):\n    return x + 2\n").symbols["f"]["body_hash"] != before
+
+def test_analyze_ast_diff_ignores_docstrings_and_formatting():
+    """Test only structural changes of functions, async functions, classes and module statements count."""
+    before_code = """
+RATE = 1
+
+class Store:
+    limit = 10
+
+    async def save(self, item):
+        return item
+
+def total(xs):
+    return sum(xs)
+"""
+    reformatted = '''"""Module docstring."""
+RATE = 1  # per call
+
+class Store:
+    """A store."""
+    limit = 10
+
+    async def save(self, item):
+        """Save an item."""
+        return (item)
+
+def total(xs):
+
+    return sum(
+        xs
+    )
+'''
+    changes = analyze_ast_diff(before_code, reformatted)
+    assert changes == {"added": [], "removed": [], "modified": [], "indirect_dependents": [], "module": False}
+
+    changes = analyze_ast_diff(before_code, before_code.replace("return item", "return None").replace("limit = 10", "limit = 5"))
+    assert changes["modified"] == ["Store", "Store.save"] and not changes["module"]
+    assert analyze_ast_diff(before_code, before_code.replace("RATE = 1", "RATE = 2"))["module"]
+
+def test_analyze_ast_diff_uses_qualified_names():
+    """Test methods with the same name in different classes are told apart."""
+    before_code = """
+class A:
+    def run(self):
+        return 1
+
+class B:
+    def run(self):
+        return 2
+
+    def start(self):
+        return self.run()
+"""
+    after_code = before_code.replace("return 2", "return 3")
+    changes = analyze_ast_diff(before_code, after_code)
+    assert changes["modified"] == ["B.run"]
+    assert changes["indirect_dependents"] == ["B.start"]
+
+    changes = analyze_ast_diff(before_code, before_code.replace("return 1", "return 4"))
+    assert changes["modified"] == ["A.run"]
+    assert changes["indirect_dependents"] == []
+
+def test_parse_source_uses_parse_cache(tmp_path):
+    """Test a blob that was parsed before is served from the cache without parsing."""
+    code = "class A:\n    def run(self):\n        return helper()\n"
+    first = parse_source(code)
+    with patch("ast_parser.extract_symbols", wraps=extract_symbols) as mock_extract:
+        second = parse_source(code)
+        changed = parse_source(code + "\ndef helper():\n    pass\n")
+
+    assert second.symbols == first.symbols
+    assert second.calls == {"A.run": {"helper"}}
+    assert mock_extract.call_count == 1
+    assert "helper" in changed.symbols
+
+    test_file = tmp_path / "module.py"
+    test_file.write_text(code)
+    with patch("ast_parser.extract_symbols") as mock_extract:
+        code_blocks = extract_code_blocks(test_file, str(tmp_path))
+    mock_extract.assert_not_called()
+    assert set(code_blocks) == {("module.py", "A"), ("module.py", "A.run")}
+
+def test_parse_source_records_imports_and_call_paths():
+    """Test imports and dotted callees are recorded for cross-module resolution."""
+    symbols = parse_source("""
+import os.path
+import pkg.mod as mod
+from . import sibling
+from ..base import Base as B
+from helpers import *
+
+class Calc(B):
+    def run(self, items):
+        calc = Calc()
+        calc.add()
+        self.check()
+        mod.helper().finish()
+        items[0].save()
+""")
+    assert symbols.imports == {"os": "os", "mod": "pkg.mod", "sibling": ".sibling", "B": "..base.Base"}
+    assert symbols.star_imports == ["helpers"]
+    assert symbols.symbols["Calc"]["bases"] == ["B"]
+    assert symbols.call_paths["Calc.run"] == {"Calc", "Calc.add", "self.check", "mod.helper", "mod.helper.finish", "?.save"}
+    assert FileSymbols.from_dict(symbols.to_dict()).call_paths == symbols.call_paths
+
+def test_expand_calls():
+    """Test transitive calls through cycles and chains too deep for recursion."""
+    call_map = {
+        "test_a": {"helper", "print"},
+        "helper": {"ping"},
+        "ping": {"pong"},
+        "pong": {"ping", "leaf"},
+        "leaf": set(),
+        "self_loop": {"self_loop"},
+    }
+    expanded = expand_calls(call_map)
+    assert expanded["test_a"] == {"helper", "print", "ping", "pong", "leaf"}
+    assert expanded["ping"] == expanded["pong"] == {"ping", "pong", "leaf"}
+    assert expanded["helper"] == {"ping", "pong", "leaf"}
+    assert expanded["leaf"] == set()
+    assert expanded["self_loop"] == {"self_loop"}
+
+    chain = {f"f{i}": {f"f{i + 1}"} for i in range(2000)}
+    expanded = expand_calls(chain)
+    assert len(expanded["f0"]) == 2000 and "f0" not in expanded["f0"]
+    assert expanded["f1999"] == {"f2000"}
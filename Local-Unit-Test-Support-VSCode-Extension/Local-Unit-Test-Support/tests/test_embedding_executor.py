@@ -0,0 +1,107 @@
+import threading
+import time
+import pytest
+from embedding_executor import EmbeddingExecutor, RateLimiter, is_retryable
+
+class APIError(Exception):
+    """Error raised by the fake embedding server, carrying an HTTP status code."""
+
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class FakeEmbeddingServer:
+    """Stub embedding endpoint that records concurrency and can fail the first calls."""
+
+    def __init__(self, failures=(), delay=0.0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    def embed(self, texts):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            failure = self.failures.pop(0) if self.failures else None
+        try:
+            time.sleep(self.delay)
+            if failure:
+                raise APIError(failure)
+            return [[float(len(text))] for text in texts]
+        finally:
+            with self.lock:
+                self.active -= 1
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_is_retryable():
+    """Test rate limits and server errors are retried, client errors are not."""
+    assert is_retryable(APIError(429))
+    assert is_retryable(APIError(503))
+    assert not is_retryable(APIError(400))
+    assert not is_retryable(ValueError("bad input"))
+
+def test_map_keeps_batch_order_within_concurrency_limit():
+    """Test batches run concurrently up to the limit and results keep their order."""
+    server = FakeEmbeddingServer(delay=0.02)
+    executor = EmbeddingExecutor(server.embed, max_concurrency=3)
+    batches = [["x" * n] for n in range(1, 11)]
+
+    assert executor.map(batches) == [[[float(n)]] for n in range(1, 11)]
+    assert 1 < server.max_active <= 3
+
+def test_retries_transient_errors_with_backoff():
+    """Test 429 and 5xx errors are retried with growing delays."""
+    server = FakeEmbeddingServer(failures=[429, 503])
+    delays = []
+    executor = EmbeddingExecutor(server.embed, base_delay=1.0, sleep=delays.append)
+    executor.backoff_delay = lambda attempt: 2.0 ** attempt
+
+    assert executor.map([["ab"]]) == [[[2.0]]]
+    assert server.calls == 3
+    assert delays == [1.0, 2.0]
+
+def test_gives_up_after_max_retries():
+    """Test persistent and non-retryable errors are raised."""
+    executor = EmbeddingExecutor(FakeEmbeddingServer(failures=[500] * 3).embed, max_retries=2, sleep=lambda _: None)
+    with pytest.raises(APIError):
+        executor.map([["a"]])
+
+    server = FakeEmbeddingServer(failures=[400])
+    with pytest.raises(APIError):
+        EmbeddingExecutor(server.embed, sleep=lambda _: None).map([["a"]])
+    assert server.calls == 1
+
+def test_rate_limiter_requests_per_minute():
+    """Test requests beyond the per-minute quota wait for the window to move on."""
+    clock = FakeClock()
+    limiter = RateLimiter(rpm=2, clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        limiter.acquire()
+    assert clock.now == 120.0
+
+def test_rate_limiter_tokens_per_minute():
+    """Test requests wait until their tokens fit in the per-minute token quota."""
+    clock = FakeClock()
+    limiter = RateLimiter(tpm=100, clock=clock, sleep=clock.sleep)
+    limiter.acquire(60)
+    limiter.acquire(40)
+    assert clock.now == 0.0
+    limiter.acquire(10)
+    assert clock.now == 60.0
+    # A request larger than the quota still goes through on its own
+    clock.now = 200.0
+    limiter.acquire(500)
+    assert clock.now == 200.0
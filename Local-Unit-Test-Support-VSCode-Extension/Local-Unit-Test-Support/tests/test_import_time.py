@@ -0,0 +1,37 @@
+import sys
+import subprocess
+from pathlib import Path
+import pytest
+
+MODULE_DIR = Path(__file__).resolve().parent.parent
+# Cold-start budget for `import main`, in milliseconds. Before heavy dependencies
+# were imported lazily it took about a second, almost all of it google.genai.
+IMPORT_TIME_BUDGET_MS = 400
+# Dependencies only the stages that use them may import
+LAZY_MODULES = ["faiss", "numpy", "google.genai", "pydantic", "dotenv"]
+
+def import_times(module: str):
+    """Import a module in a fresh interpreter and return the cumulative -X importtime of every module, in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=MODULE_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+@pytest.mark.parametrize("module", ["main", "server"])
+def test_heavy_dependencies_are_imported_lazily(module):
+    """Test importing the entry points does not load the index, embedding or suggestion libraries."""
+    times = import_times(module)
+    assert module in times
+    assert [name for name in LAZY_MODULES if name in times] == []
+
+def test_import_time_budget():
+    """Test `import main` stays within the cold-start budget (best of three runs)."""
+    best_ms = min(import_times("main")["main"] for _ in range(3)) / 1000
+    assert best_ms < IMPORT_TIME_BUDGET_MS, f"import main took {best_ms:.0f} ms, budget is {IMPORT_TIME_BUDGET_MS} ms"
@@ -1,6 +1,5 @@
 import os
 import pytest
-from pathlib import Path
 from unittest.mock import patch, MagicMock
 from main import (
     load_existing_index,
@@ -8,6 +7,8 @@ from main import (
     analyze_changed_files,
     process_test_files,
     generate_report,
+    retrieve_related_tests,
+    format_test_code,
     main
 )
 
@@ -40,20 +41,19 @@ def mock_code_blocks():
 def test_load_existing_index(tmp_path):
     """Test loading existing index and metadata."""
     index_path = tmp_path / "index.faiss"
-    meta_path = tmp_path / "metadata.json"
+    meta_path = tmp_path / "metadata.db"
     
     # Create mock metadata
-    import json
-    metadata = [
-        {
+    from rag_retrieval import save_metadata
+    metadata = {
+        ("test_file.py", "func1"): {
             "symbol_type": "function",
             "symbol_name": "func1",
             "file_path": "test_file.py",
             "code": "def func1():\n    pass"
         }
-    ]
-    with open(meta_path, 'w') as f:
-        json.dump(metadata, f)
+    }
+    save_metadata(metadata, str(meta_path))
     
     # Create empty FAISS index
     import faiss
@@ -61,16 +61,23 @@ def test_load_existing_index(tmp_path):
     faiss.write_index(index, str(index_path))
     
     code_blocks, exists = load_existing_index(str(index_path), str(meta_path))
-    assert exists
-    assert len(code_blocks) == 1
-    assert ("test_file.py", "func1") in code_blocks
+    with code_blocks:
+        assert exists
+        assert len(code_blocks) == 1
+        assert ("test_file.py", "func1") in code_blocks
 
-def test_process_code_files(mock_repo_path, mock_code_blocks):
-    """Test processing code files."""
-    with patch('main.load_existing_index') as mock_load:
-        mock_load.return_value = (mock_code_blocks, True)
+    assert load_existing_index(str(tmp_path / "missing.faiss"), str(meta_path)) == (None, False)
+
+def test_process_code_files(tmp_path, mock_repo_path, mock_code_blocks, monkeypatch):
+    """Test an index without a manifest is validated by refresh_index instead of trusted as is."""
+    from rag_retrieval import save_metadata
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "index.faiss").write_bytes(b"legacy")
+    save_metadata(mock_code_blocks, "metadata.db")
+    with patch('main.refresh_index') as mock_refresh:
         code_blocks = process_code_files(mock_repo_path)
-        assert code_blocks == mock_code_blocks
+    mock_refresh.assert_called_once()
+    assert code_blocks is mock_refresh.return_value
 
 def test_analyze_changed_files(mock_git_diff_extractor):
     """Test analyzing changed files."""
@@ -102,14 +109,13 @@ def test_func1():
     assert True
             """
             
-            affected_metadata, whole_test_code = process_test_files(
+            affected_metadata = process_test_files(
                 mock_repo_path,
                 ["func1"],
                 mock_code_blocks
             )
             
             assert len(affected_metadata) > 0
-            assert "test_func1" in whole_test_code
 
 def test_generate_report(tmp_path):
     """Test generating report."""
@@ -152,10 +158,7 @@ def test_main_workflow(mock_repo_path, mock_git_diff_extractor, mock_code_blocks
             )
             
             with patch('main.process_test_files') as mock_process:
-                mock_process.return_value = (
-                    [{"symbol_name": "test_func"}],
-                    "def test_func():\n    pass"
-                )
+                mock_process.return_value = [{"symbol_name": "test_func"}]
                 
                 with patch('main.generate_report') as mock_report:
                     main(
@@ -166,4 +169,179 @@ def test_main_workflow(mock_repo_path, mock_git_diff_extractor, mock_code_blocks
                         output_filename="test_report"
                     )
                     
-                    mock_report.assert_called_once() 
\ No newline at end of file
+                    mock_report.assert_called_once()
+
+def test_retrieve_related_tests(tmp_path):
+    """Test related test functions are selected from the index by the changed code."""
+    from rag_retrieval import save_to_faiss, load_metadata
+    code_blocks = {
+        ("math_utils.py", "pad"): {"symbol_type": "function", "symbol_name": "pad", "file_path": "math_utils.py", "code": "def pad(x): ..."},
+        ("tests/test_math.py", "test_pad"): {"symbol_type": "function", "symbol_name": "test_pad", "file_path": "tests/test_math.py", "code": "def test_pad(): ..."},
+        ("tests/test_math.py", "test_add"): {"symbol_type": "function", "symbol_name": "test_add", "file_path": "tests/test_math.py", "code": "def test_add(): ..."},
+    }
+    vectors = {"def pad(x): ...": [0.0, 0.0], "def test_pad(): ...": [1.0, 0.0], "def test_add(): ...": [50.0, 50.0]}
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    save_to_faiss([vectors[b["code"]] for b in code_blocks.values()], code_blocks, index_path, meta_path)
+
+    changed_functions = {"math_utils.py": {"added": [], "removed": [], "modified": ["pad"], "indirect_dependents": []}}
+    with patch("main.get_embeddings", side_effect=lambda texts: [[0.0, 0.0] for _ in texts]) as mock_embed:
+        related = retrieve_related_tests(changed_functions, load_metadata(meta_path), "", top_k=1, index_path=index_path)
+
+    mock_embed.assert_called_once_with(["def pad(x): ..."])
+    assert [block["symbol_name"] for block in related] == ["test_pad"]
+
+def test_retrieve_related_tests_searches_past_source_hits(tmp_path):
+    """Test top_k tests are returned when source symbols fill the first top_k * 4 hits."""
+    from rag_retrieval import save_to_faiss, load_metadata
+    code_blocks = {
+        ("calc.py", f"func_{i}"): {"symbol_type": "function", "symbol_name": f"func_{i}", "file_path": "calc.py", "code": f"def func_{i}(): ..."}
+        for i in range(12)
+    }
+    for name in ["test_near", "test_far"]:
+        code_blocks[("tests/test_calc.py", name)] = {
+            "symbol_type": "function", "symbol_name": name, "file_path": "tests/test_calc.py", "code": f"def {name}(): ..."
+        }
+    vectors = [[float(i), 0.0] for i in range(12)] + [[20.0, 0.0], [40.0, 0.0]]
+    index_path = str(tmp_path / "index.faiss")
+    meta_path = str(tmp_path / "metadata.db")
+    save_to_faiss(vectors, code_blocks, index_path, meta_path)
+
+    changed_functions = {"calc.py": {"added": [], "removed": [], "modified": ["func_0"], "indirect_dependents": []}}
+    with patch("main.get_embeddings", side_effect=lambda texts: [[0.0, 0.0] for _ in texts]):
+        related = retrieve_related_tests(changed_functions, load_metadata(meta_path), "", top_k=2, index_path=index_path)
+
+    assert [block["symbol_name"] for block in related] == ["test_near", "test_far"]
+
+def test_format_test_code():
+    """Test formatting selected test functions grouped by file."""
+    blocks = [
+        {"file_path": "tests/test_a.py", "symbol_name": "test_one", "code": "def test_one(): ..."},
+        {"file_path": "tests/test_a.py", "symbol_name": "test_one", "code": "def test_one(): ..."},
+        {"file_path": "tests/test_b.py", "symbol_name": "test_two", "code": "def test_two(): ..."},
+    ]
+    test_code = format_test_code(blocks)
+    assert test_code.count("def test_one") == 1
+    assert test_code.startswith("tests/test_a.py\ndef test_one(): ...")
+    assert "tests/test_b.py\ndef test_two(): ..." in test_code
+
+
+def test_main_commit_range(tmp_path, monkeypatch, git_repo, commit):
+    """Test range mode reports every commit on its own and only re-parses changed test files."""
+    from ast_parser import parse_source
+    from metadata_store import MetadataStore
+    from embedding_providers import LocalEmbeddingProvider
+    monkeypatch.setattr("rag_retrieval._embedding_provider", LocalEmbeddingProvider())
+    monkeypatch.chdir(tmp_path)
+    repo_path = git_repo
+    base = commit(repo_path, {"calc.py": "def add(x, y):\n    return x + y\n", "test_calc.py": "from calc import add\n\ndef test_add():\n    add(1, 2)\n"})
+    first = commit(repo_path, {"calc.py": "def add(x, y):\n    return y + x\n"})
+    second = commit(repo_path, {"calc.py": "def add(x, y):\n    return y + x\n\ndef sub(x, y):\n    return x - y\n",
+                     "test_calc.py": "import calc\n\ndef test_add():\n    calc.add(1, 2)\n\ndef test_sub():\n    calc.sub(2, 1)\n"})
+    third = commit(repo_path, {"calc.py": "def add(x, y):\n    return y + x\n\ndef sub(x, y):\n    return -(y - x)\n"})
+
+    with patch("main.generate_report") as mock_report, patch("ast_parser.parse_source", wraps=parse_source) as mock_parse, \
+            patch.object(MetadataStore, "get_impacted_tests", autospec=True, side_effect=MetadataStore.get_impacted_tests) as mock_lookup, \
+            patch("main.build_repo_call_graph") as mock_graph:
+        main(str(repo_path), base, third, False, "range", clone_mode="local", commit_range=True)
+
+    reports = [call.args for call in mock_report.call_args_list]
+    assert [args[3] for args in reports] == [f"range-001-{first[:8]}.md", f"range-002-{second[:8]}.md", f"range-003-{third[:8]}.md"]
+    assert [block["symbol_name"] for block in reports[0][0]] == ["test_add"]
+    assert "+def sub(x, y):" in reports[1][2] and "-    return x + y" not in reports[1][2]
+    assert [block["symbol_name"] for block in reports[1][0]] == ["test_sub"]
+    assert [block["symbol_name"] for block in reports[2][0]] == ["test_sub"]
+    # Affected tests and indirect dependents come from the index, without a call graph of the repository
+    assert mock_lookup.call_count == 3
+    mock_graph.assert_not_called()
+    # test_calc.py is parsed once per version, not once per commit
+    assert sum("def test_add" in call.args[0] for call in mock_parse.call_args_list) == 2
+
+def test_main_skips_formatting_only_commits(tmp_path, monkeypatch, git_repo, commit):
+    """Test a commit that only reformats code and docstrings stops before the index and the model."""
+    monkeypatch.chdir(tmp_path)
+    repo_path = git_repo
+    for code in ["def add(x, y):\n    return x+y\n", 'def add(x, y):\n    """Add."""\n    return x + y  # sum\n']:
+        commit(repo_path, {"calc.py": code})
+
+    with patch("main.process_code_files") as mock_index, patch("main.generate_report") as mock_report:
+        main(str(repo_path), "HEAD^", "HEAD", False, "report", clone_mode="local")
+    mock_index.assert_not_called()
+    mock_report.assert_not_called()
+
+def test_main_indexes_to_commit(tmp_path, monkeypatch, git_repo, commit):
+    """Test a clone is indexed and analyzed at --to, not at the tip of its branch."""
+    from rag_retrieval import load_manifest
+    from embedding_providers import LocalEmbeddingProvider
+    monkeypatch.setattr("rag_retrieval._embedding_provider", LocalEmbeddingProvider())
+    monkeypatch.chdir(tmp_path)
+    repo_path = git_repo
+    commits = [
+        commit(repo_path, {"calc.py": code, "test_calc.py": "from calc import add\n\ndef test_add():\n    add(1, 2)\n"})
+        for code in ["def add(x, y):\n    return x + y\n", "def add(x, y):\n    return y + x\n", "def mul(x, y):\n    return x * y\n"]
+    ]
+
+    with patch("main.generate_report") as mock_report:
+        main(f"file://{repo_path}", commits[0], commits[1], False, "report", clone_mode="full")
+
+    assert load_manifest("index.faiss")["commit"] == commits[1]
+    assert [block["symbol_name"] for block in mock_report.call_args.args[0]] == ["test_add"]
+
+def test_main_selects_callers_of_deleted_functions(tmp_path, monkeypatch, git_repo, commit):
+    """Test tests still calling a deleted function are selected when the index has a reverse dependency index."""
+    from metadata_store import MetadataStore
+    from embedding_providers import LocalEmbeddingProvider
+    monkeypatch.setattr("rag_retrieval._embedding_provider", LocalEmbeddingProvider())
+    monkeypatch.chdir(tmp_path)
+    commit(git_repo, {
+        "pkg/__init__.py": "",
+        "pkg/mod.py": "def foo():\n    return 1\n\ndef bar():\n    return 2\n",
+        "tests/test_mod.py": "from pkg.mod import foo, bar\n\ndef test_foo():\n    foo()\n\ndef test_bar():\n    bar()\n",
+    })
+    commit(git_repo, {"pkg/mod.py": "def bar():\n    return 3\n"})
+
+    # The first run builds the index at HEAD, the second finds it up to date
+    for _ in range(2):
+        with patch("main.generate_report") as mock_report, \
+                patch.object(MetadataStore, "get_impacted_tests", autospec=True, side_effect=MetadataStore.get_impacted_tests) as mock_lookup:
+            main(str(git_repo), "HEAD^", "HEAD", False, "report", clone_mode="local")
+        mock_lookup.assert_called_once()
+        assert [block["symbol_name"] for block in mock_report.call_args.args[0]] == ["test_bar", "test_foo"]
+
+def test_main_reads_indirect_dependents_from_index(tmp_path, monkeypatch, git_repo, commit):
+    """Test indirect dependents come from the call edges stored in the index once it is up to date."""
+    from embedding_providers import LocalEmbeddingProvider
+    monkeypatch.setattr("rag_retrieval._embedding_provider", LocalEmbeddingProvider())
+    monkeypatch.chdir(tmp_path)
+    commit(git_repo, {
+        "calc.py": "def add(x, y):\n    return x + y\n",
+        "service.py": "from calc import add\n\ndef total(xs):\n    return add(xs[0], xs[1])\n\ndef report(xs):\n    return str(total(xs))\n",
+        "test_service.py": "from service import report\n\ndef test_report():\n    report([1, 2])\n",
+    })
+    commit(git_repo, {"calc.py": "def add(x, y):\n    return y + x\n"})
+
+    for _ in range(2):
+        with patch("main.generate_report") as mock_report, patch("main.retrieve_related_tests", return_value=[]) as mock_retrieve, \
+                patch("main.build_repo_call_graph") as mock_graph:
+            main(str(git_repo), "HEAD^", "HEAD", False, "report", clone_mode="local")
+        mock_graph.assert_not_called()
+        assert mock_retrieve.call_args.args[0]["service.py"]["indirect_dependents"] == ["report", "total"]
+        assert [block["symbol_name"] for block in mock_report.call_args.args[0]] == ["test_report"]
+
+def test_find_indirect_dependents():
+    """Test indirect dependents follow resolved calls across modules, not bare names."""
+    from ast_parser import parse_source
+    from call_graph import RepoCallGraph
+    from main import find_indirect_dependents
+    graph = RepoCallGraph({path: parse_source(code) for path, code in {
+        "users.py": "class User:\n    def save(self):\n        pass\n",
+        "files.py": "class File:\n    def save(self):\n        pass\n",
+        "service.py": "from users import User\n\ndef register():\n    User().save()\n\ndef api():\n    register()\n",
+        "archive.py": "from files import File\n\ndef store():\n    File().save()\n",
+        "test_service.py": "from service import api\n\ndef test_api():\n    api()\n",
+    }.items()})
+    changed_functions = {"users.py": {"added": [], "removed": [], "modified": ["User.save"], "indirect_dependents": ["File.save"]}}
+    find_indirect_dependents(changed_functions, graph)
+    assert changed_functions["users.py"]["indirect_dependents"] == []
+    assert changed_functions["service.py"]["indirect_dependents"] == ["api", "register"]
+    assert "archive.py" not in changed_functions
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from rag_generation import GeminiSuggester, SuggestionSchema, SuggestionResponse
 
 @pytest.fixture
@@ -1,9 +1,11 @@
-import os
 import pytest
 import numpy as np
-from pathlib import Path
 from unittest.mock import patch, MagicMock
-from rag_retrieval import get_embedding, save_to_faiss, get_code_files
+from rag_retrieval import (
+    get_embedding, get_embeddings, save_to_faiss, search_index, symbol_id, get_code_files,
+    choose_index_type, create_faiss_index, load_faiss_index, save_manifest, LazyFaissIndex
+)
+from embedding_providers import make_batches
 
 @pytest.fixture
 def mock_embedding():
@@ -41,7 +43,7 @@ def test_get_embedding_error():
 def test_save_to_faiss(tmp_path, mock_embedding, mock_code_blocks):
     """Test saving embeddings to FAISS index."""
     index_path = tmp_path / "test_index.faiss"
-    meta_path = tmp_path / "test_metadata.json"
+    meta_path = tmp_path / "test_metadata.db"
     
     embeddings = [mock_embedding]
     save_to_faiss(embeddings, mock_code_blocks, str(index_path), str(meta_path))
@@ -50,16 +52,16 @@ def test_save_to_faiss(tmp_path, mock_embedding, mock_code_blocks):
     assert meta_path.exists()
     
     # Verify metadata content
-    import json
-    with open(meta_path, 'r') as f:
-        metadata = json.load(f)
+    from metadata_store import MetadataStore
+    metadata = MetadataStore(str(meta_path))
     assert len(metadata) == 1
-    assert metadata[0]["symbol_name"] == "func1"
+    assert metadata[("test_file.py", "func1")]["symbol_name"] == "func1"
+    assert metadata.get_by_ids([symbol_id("test_file.py", "func1")])
 
 def test_save_to_faiss_empty_embeddings(tmp_path, mock_code_blocks):
     """Test saving empty embeddings to FAISS index."""
     index_path = tmp_path / "test_index.faiss"
-    meta_path = tmp_path / "test_metadata.json"
+    meta_path = tmp_path / "test_metadata.db"
     
     with pytest.raises(ValueError) as exc_info:
         save_to_faiss([], mock_code_blocks, str(index_path), str(meta_path))
@@ -97,4 +99,114 @@ def test_get_code_files_with_custom_pattern(tmp_path):
     
     files = get_code_files(str(repo_path), include_pattern="*.txt")
     assert len(files) == 1
-    assert str(files[0]).endswith(".txt") 
\ No newline at end of file
+    assert str(files[0]).endswith(".txt")
+
+def test_make_batches():
+    """Test grouping texts into batches within the request limits."""
+    texts = ["a" * 10] * 5
+    assert make_batches(texts, max_batch_size=2) == [[0, 1], [2, 3], [4]]
+    assert make_batches(texts, max_batch_size=10, max_batch_chars=25) == [[0, 1], [2, 3], [4]]
+    assert make_batches([]) == []
+
+def test_get_embeddings_batches_in_order():
+    """Test batched embeddings are returned in input order with one client."""
+    def fake_embed_content(model, contents, config):
+        response = MagicMock()
+        response.embeddings = [MagicMock(values=[float(len(text))]) for text in contents]
+        return response
+
+    mock_client = MagicMock()
+    mock_client.models.embed_content.side_effect = fake_embed_content
+    texts = ["x" * n for n in range(1, 151)]
+    with patch("embedding_providers.get_client", return_value=mock_client):
+        embeddings = get_embeddings(texts)
+
+    assert embeddings == [[float(n)] for n in range(1, 151)]
+    assert mock_client.models.embed_content.call_count == 2
+
+def test_get_embeddings_uses_cache():
+    """Test unchanged code is served from the embedding cache."""
+    mock_client = MagicMock()
+    mock_client.models.embed_content.side_effect = lambda model, contents, config: MagicMock(
+        embeddings=[MagicMock(values=[1.0, 2.0]) for _ in contents]
+    )
+    with patch("embedding_providers.get_client", return_value=mock_client):
+        first = get_embeddings(["def f():\n    pass", "def f():\n    pass"])
+        second = get_embeddings(["def f():\n    pass"])
+
+    assert first == [[1.0, 2.0], [1.0, 2.0]]
+    assert second == [[1.0, 2.0]]
+    mock_client.models.embed_content.assert_called_once()
+    assert mock_client.models.embed_content.call_args.kwargs["contents"] == ["def f():\n    pass"]
+
+def test_search_index(tmp_path):
+    """Test batch-querying the index returns IDs ordered by distance."""
+    index_path = str(tmp_path / "test_index.faiss")
+    code_blocks = {
+        ("a.py", "near"): {"symbol_type": "function", "symbol_name": "near", "file_path": "a.py", "code": "near"},
+        ("a.py", "far"): {"symbol_type": "function", "symbol_name": "far", "file_path": "a.py", "code": "far"},
+    }
+    save_to_faiss([[0.0, 0.0], [10.0, 10.0]], code_blocks, index_path, str(tmp_path / "test_metadata.db"))
+
+    results = search_index([[1.0, 1.0], [9.0, 9.0]], k=5, save_path=index_path)
+    assert [vector_id for vector_id, _ in results[0]] == [symbol_id("a.py", "near"), symbol_id("a.py", "far")]
+    assert results[1][0] == (symbol_id("a.py", "far"), 2.0)
+    assert search_index([], save_path=index_path) == []
+
+def test_choose_index_type():
+    """Test the index type is picked from the corpus size."""
+    assert choose_index_type(1_000) == "flat"
+    assert choose_index_type(200_000) == "ivf_flat"
+    assert choose_index_type(5_000_000) == "ivf_pq"
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq", "hnsw"])
+def test_create_faiss_index(index_type):
+    """Test every index type can be trained, filled and searched."""
+    vectors = np.random.RandomState(0).rand(500, 16).astype("float32")
+    index, params = create_faiss_index(vectors, index_type)
+    index.add_with_ids(vectors, np.arange(500, dtype="int64"))
+
+    assert params["type"] == index_type
+    _, ids = index.search(vectors[:1], 1)
+    assert ids[0][0] == 0
+
+def test_load_faiss_index_restores_search_params(tmp_path):
+    """Test loading an index applies the parameters stored in its manifest."""
+    import faiss
+    index_path = str(tmp_path / "index.faiss")
+    vectors = np.random.RandomState(0).rand(500, 16).astype("float32")
+    index, params = create_faiss_index(vectors, "ivf_flat", {"nlist": 8, "nprobe": 3})
+    faiss.write_index(index, index_path)
+    save_manifest(index_path, {"index": {**params, "nprobe": 5}})
+
+    loaded = load_faiss_index(index_path)
+    assert faiss.extract_index_ivf(loaded).nprobe == 5
+    assert faiss.extract_index_ivf(loaded).nlist == 8
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_load_faiss_index_mmap(tmp_path, index_type):
+    """Test every index type can be loaded memory-mapped and searched."""
+    import faiss
+    index_path = str(tmp_path / "index.faiss")
+    vectors = np.random.RandomState(0).rand(500, 16).astype("float32")
+    index, _ = create_faiss_index(vectors, index_type)
+    index.add_with_ids(vectors, np.arange(500, dtype="int64"))
+    faiss.write_index(index, index_path)
+
+    _, ids = load_faiss_index(index_path, mmap=True).search(vectors[:1], 1)
+    assert ids[0][0] == 0
+
+def test_lazy_faiss_index(tmp_path):
+    """Test the index is read on first use and reloaded when the file is replaced."""
+    index_path = str(tmp_path / "index.faiss")
+    code_blocks = {("a.py", "f"): {"symbol_type": "function", "symbol_name": "f", "file_path": "a.py", "code": "f"}}
+    save_to_faiss([[0.0, 0.0]], code_blocks, index_path, str(tmp_path / "metadata.db"))
+
+    lazy_index = LazyFaissIndex(index_path)
+    assert not lazy_index.is_loaded
+    assert lazy_index.get().ntotal == 1
+    assert lazy_index.is_loaded
+
+    code_blocks[("a.py", "g")] = {"symbol_type": "function", "symbol_name": "g", "file_path": "a.py", "code": "g"}
+    save_to_faiss([[0.0, 0.0], [1.0, 1.0]], code_blocks, index_path, str(tmp_path / "metadata.db"))
+    assert lazy_index.get().ntotal == 2
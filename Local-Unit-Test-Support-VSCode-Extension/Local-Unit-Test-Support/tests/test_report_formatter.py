@@ -1,4 +1,3 @@
-import pytest
 from report_formatter import generate_suggestion_markdown
 
 def test_generate_suggestion_markdown():
@@ -0,0 +1,58 @@
+import io
+import json
+from unittest.mock import patch
+from server import AnalysisServer, PARSE_ERROR, METHOD_NOT_FOUND, INVALID_PARAMS, INTERNAL_ERROR
+
+def serve(*requests):
+    """Run a server over the given request lines and return its responses."""
+    reader = io.StringIO("".join(line if isinstance(line, str) else json.dumps(line) + "\n" for line in requests))
+    writer = io.StringIO()
+    server = AnalysisServer(reader, writer)
+    server.serve()
+    return [json.loads(line) for line in writer.getvalue().splitlines()], server
+
+def test_protocol_errors():
+    """Test malformed requests, unknown methods and notifications."""
+    responses, _ = serve(
+        "not json\n",
+        {"jsonrpc": "2.0", "id": 1, "method": "ping"},
+        {"jsonrpc": "2.0", "id": 2, "method": "explode"},
+        {"jsonrpc": "2.0", "method": "ping"},
+        {"jsonrpc": "2.0", "id": 3, "method": "analyze", "params": {}},
+    )
+    assert responses[0]["error"]["code"] == PARSE_ERROR
+    assert responses[1] == {"jsonrpc": "2.0", "id": 1, "result": "pong"}
+    assert responses[2]["error"]["code"] == METHOD_NOT_FOUND
+    assert responses[3]["id"] == 3 and responses[3]["error"]["code"] == INVALID_PARAMS
+    assert len(responses) == 4
+
+def test_analyze_keeps_state_between_requests(tmp_path):
+    """Test analyses run in one process, reuse the parsed test files and keep stdout for the protocol."""
+    repo_path = str(tmp_path)
+    def fake_run_analysis(repo, from_commit, to_commit, keep_repo, output, top_k, clone_mode, depth, commit_range, parsed_files):
+        print("progress output from the pipeline")
+        parsed_files.setdefault("blob", 0)
+        parsed_files["blob"] += 1
+        return [f"{output}.md"]
+
+    with patch("server.run_analysis", side_effect=fake_run_analysis) as mock_run:
+        responses, server = serve(
+            {"jsonrpc": "2.0", "id": 1, "method": "analyze", "params": {"repo_path": repo_path, "from": "a", "to": "b"}},
+            {"jsonrpc": "2.0", "id": 2, "method": "analyze", "params": {"repo_path": repo_path, "output": "next"}},
+            {"jsonrpc": "2.0", "id": 3, "method": "shutdown"},
+            {"jsonrpc": "2.0", "id": 4, "method": "ping"},
+        )
+
+    assert [response["result"] for response in responses] == [{"reports": ["report.md"]}, {"reports": ["next.md"]}, None]
+    assert mock_run.call_args_list[0].args[:9] == (repo_path, "a", "b", False, "report", 20, "local", None, False)
+    assert server.parsed_files == {repo_path: {"blob": 2}}
+
+def test_analyze_errors_are_reported():
+    """Test a failing analysis is answered with an error and the server keeps running."""
+    with patch("server.run_analysis", side_effect=RuntimeError("clone failed")):
+        responses, _ = serve(
+            {"jsonrpc": "2.0", "id": 1, "method": "analyze", "params": {"repo_url": "https://example.com/repo.git"}},
+            {"jsonrpc": "2.0", "id": 2, "method": "ping"},
+        )
+    assert responses[0]["error"] == {"code": INTERNAL_ERROR, "message": "clone failed"}
+    assert responses[1]["result"] == "pong"
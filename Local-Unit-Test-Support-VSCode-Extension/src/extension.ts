@@ -1,11 +1,108 @@
 // The module 'vscode' contains the VS Code extensibility API
 // Import the module and reference it with the alias vscode in your code below
 import * as vscode from 'vscode';
-import { exec } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import * as readline from 'readline';
 import * as path from 'path';
 import * as fs from 'fs';
 import simpleGit, { SimpleGit } from 'simple-git';
 
+// The result of an "analyze" request: the paths of the reports that were written.
+interface AnalyzeResult {
+    reports: string[];
+}
+
+// A resident Python analysis server (server.py) that speaks JSON-RPC over stdin/stdout,
+// one JSON message per line. It is spawned on the first analysis and reused by the
+// following ones, so the Python imports, the index and the API clients stay loaded.
+class AnalysisServer {
+    private process: ChildProcessWithoutNullStreams | undefined;
+    private nextId = 1;
+    private pending = new Map<number, { resolve: (result: any) => void; reject: (error: Error) => void }>();
+
+    constructor(
+        readonly pythonPath: string,
+        readonly scriptPath: string,
+        readonly cwd: string,
+        private readonly output: vscode.OutputChannel
+    ) {}
+
+    request(method: string, params: object = {}): Promise<any> {
+        const child = this.start();
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            this.pending.set(id, { resolve, reject });
+            child.stdin.write(JSON.stringify({ jsonrpc: '2.0', id, method, params }) + '\n');
+        });
+    }
+
+    // Stop the server; the next request starts a new one.
+    dispose() {
+        if (this.process) {
+            this.process.kill();
+            this.process = undefined;
+        }
+    }
+
+    private start(): ChildProcessWithoutNullStreams {
+        if (this.process) {
+            return this.process;
+        }
+        const child = spawn(this.pythonPath, [this.scriptPath], { cwd: this.cwd });
+        // Responses come on stdout; logs and anything the pipeline prints come on stderr.
+        readline.createInterface({ input: child.stdout }).on('line', line => this.onMessage(line));
+        child.stderr.on('data', data => this.output.append(data.toString()));
+        child.on('error', error => this.onExit(child, error));
+        child.on('exit', code => this.onExit(child, new Error(`Analysis server exited with code ${code}`)));
+        this.process = child;
+        return child;
+    }
+
+    private onMessage(line: string) {
+        let message: any;
+        try {
+            message = JSON.parse(line);
+        } catch {
+            this.output.appendLine(line);
+            return;
+        }
+        const pending = this.pending.get(message.id);
+        if (!pending) {
+            return;
+        }
+        this.pending.delete(message.id);
+        if (message.error) {
+            pending.reject(new Error(message.error.message));
+        } else {
+            pending.resolve(message.result);
+        }
+    }
+
+    private onExit(child: ChildProcessWithoutNullStreams, error: Error) {
+        if (this.process === child) {
+            this.process = undefined;
+        }
+        for (const pending of this.pending.values()) {
+            pending.reject(error);
+        }
+        this.pending.clear();
+    }
+}
+
+let analysisServer: AnalysisServer | undefined;
+
+// Return the running server, replacing it when the Python path or workspace changed.
+function getAnalysisServer(pythonPath: string, scriptPath: string, cwd: string, output: vscode.OutputChannel): AnalysisServer {
+    if (analysisServer && (analysisServer.pythonPath !== pythonPath || analysisServer.scriptPath !== scriptPath || analysisServer.cwd !== cwd)) {
+        analysisServer.dispose();
+        analysisServer = undefined;
+    }
+    if (!analysisServer) {
+        analysisServer = new AnalysisServer(pythonPath, scriptPath, cwd, output);
+    }
+    return analysisServer;
+}
+
 // This method is called when your extension is activated
 // Your extension is activated the very first time the command is executed
 export function activate(context: vscode.ExtensionContext) {
@@ -14,6 +111,10 @@ export function activate(context: vscode.ExtensionContext) {
 	// This line of code will only be executed once when your extension is activated
 	console.log('Congratulations, your extension "CoverIQ-Local-Unit-Test-Support" is now active!');
 
+	// Server logs are shown in their own output channel.
+	const output = vscode.window.createOutputChannel('CoverIQ');
+	context.subscriptions.push(output);
+
 	// Register the main command for the extension. This command is defined in package.json.
 	let disposable = vscode.commands.registerCommand('CoverIQ-Local-Unit-Test-Support.analyze', async () => {
         // Get the currently opened folder in VS Code. This is our target repository.
@@ -34,8 +135,7 @@ export function activate(context: vscode.ExtensionContext) {
 
         // Define constants for the analysis process.
         const outputFileName = 'report'; // Or make this configurable
-        const pythonScriptPath = path.join(context.extensionPath, 'Local-Unit-Test-Support', 'main.py');
-        const outputPath = path.join(workspacePath, `${outputFileName}.md`);
+        const pythonScriptPath = path.join(context.extensionPath, 'Local-Unit-Test-Support', 'server.py');
         let fromCommit: string | undefined;
         let toCommit: string | undefined;
 
@@ -99,14 +199,9 @@ export function activate(context: vscode.ExtensionContext) {
             return;
         }
 
-        // Assemble the full command to execute the Python script with all arguments.
-        let command = `${pythonExecutablePath} ${pythonScriptPath} --repo-path "${workspacePath}" --output ${outputFileName}`;
-        if (fromCommit) {
-            command += ` --from ${fromCommit}`;
-        }
-        if (toCommit) {
-            command += ` --to ${toCommit}`;
-        }
+        // Send the analysis to the resident Python server, starting it if needed.
+        const server = getAnalysisServer(pythonExecutablePath, pythonScriptPath, workspacePath, output);
+        const params = { repo_path: workspacePath, output: outputFileName, from: fromCommit, to: toCommit };
 
         // Use the withProgress API to show a cancellable notification to the user.
         vscode.window.withProgress({
@@ -114,35 +209,31 @@ export function activate(context: vscode.ExtensionContext) {
             title: "Analyzing Unit Tests...",
             cancellable: true
         }, async (progress, token) => {
+            let cancelled = false;
             token.onCancellationRequested(() => {
-                // You might need a way to kill the child process here
+                // Stopping the server aborts the analysis; the next one starts a new server
+                cancelled = true;
+                server.dispose();
                 vscode.window.showWarningMessage("Analysis cancelled.");
             });
 
             progress.report({ increment: 0 });
 
-            return new Promise<void>((resolve, reject) => {
-                // Execute the command as a child process.
-                exec(command, { cwd: workspacePath }, (error, stdout, stderr) => {
-                    progress.report({ increment: 100 });
-                    if (error) {
-                        vscode.window.showErrorMessage(`Error: ${error.message}`);
-                        reject();
-                        return;
-                    }
-                    if (stderr) {
-                        vscode.window.showWarningMessage(`Stderr: ${stderr}`);
-                    }
-                    if (stdout) {
-                        console.log(`Stdout from Python script: ${stdout}`);
-                    }
-
-                    // Show the generated report
-                    const reportUri = vscode.Uri.file(outputPath);
-                    vscode.commands.executeCommand('markdown.showPreview', reportUri);
-                    resolve();
-                });
-            });
+            try {
+                const result: AnalyzeResult = await server.request('analyze', params);
+                progress.report({ increment: 100 });
+                if (!result.reports.length) {
+                    vscode.window.showInformationMessage('No test suggestions were generated.');
+                    return;
+                }
+                // Show the generated report
+                const reportUri = vscode.Uri.file(result.reports[0]);
+                vscode.commands.executeCommand('markdown.showPreview', reportUri);
+            } catch (error: any) {
+                if (!cancelled) {
+                    vscode.window.showErrorMessage(`Error: ${error.message}`);
+                }
+            }
         });
     });
 
@@ -150,4 +241,7 @@ export function activate(context: vscode.ExtensionContext) {
 }
 
 // This method is called when your extension is deactivated
-export function deactivate() {}
+export function deactivate() {
+    analysisServer?.dispose();
+    analysisServer = undefined;
+}